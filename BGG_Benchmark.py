@@ -0,0 +1,416 @@
+import argparse
+import functools
+import gc
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from xml.sax.saxutils import escape, quoteattr
+
+import BGG_PlayerCountData as bgg
+
+# The viewer needs PyQt5 and numpy; its benchmarks are skipped without them.
+try:
+    import BGG_DataDisplay as viewer
+except ImportError:
+    viewer = None
+
+# The peak memory of a benchmark is read from the resource usage of a child process, which is not available on Windows.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Below are the imports required for the benchmarks:
+# - `BGG_PlayerCountData`: the collection script whose parsers and writers are measured.
+# - `BGG_DataDisplay`: optional, the viewer whose data loading is measured.
+# - `multiprocessing` and `resource`: used to measure the peak memory (RSS) of each benchmark in a child process,
+#   which includes the memory lxml allocates outside of Python.
+# - `xml.sax.saxutils`: used to escape text in the generated HTML and XML fixtures.
+
+# Sizes of the thing API batches to parse, matching the range of --batch_size values in use.
+DEFAULT_THING_BATCH_SIZES = (20, 100, 500)
+
+# Number of games in the catalogs used for the output writers and the viewer.
+DEFAULT_CATALOG_SIZES = (10000,)
+
+# Words used to build synthetic game titles.
+TITLE_WORDS = ("Castle", "Dragon", "Empire", "Harbor", "Legacy", "Mystic", "Orchard", "Quest", "River", "Space",
+               "Tavern", "Twilight", "Village", "Wars", "Zombie", "&", "of", "the", "Über", "Çatal")
+
+def generate_catalog(num_games, seed=0):
+    """
+    Generates a synthetic catalog of games resembling the BoardGameGeek search results.
+
+    The catalog is the same for the same number of games and seed. About one game in five is an
+    expansion, one in ten is unranked, and each game has poll results for one to ten players
+    plus an ambiguous "N+" count, as on BoardGameGeek.
+
+    Args:
+        num_games (int): The number of games in the catalog.
+        seed (int): The seed for the random values.
+
+    Returns:
+        list: One dictionary per game, sorted by descending average rating like the search pages.
+    """
+    rng = random.Random(seed)
+    catalog = []
+
+    for i in range(num_games):
+        max_players = rng.randint(1, 10)
+        catalog.append({
+            'id': str(1000 + 7 * i),
+            'title': " ".join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(1, 4))) + f" {i}",
+            'expansion': rng.random() < 0.2,
+            'year': rng.randint(1950, 2024),
+            'average': round(rng.uniform(5, 9), 5),
+            'voters': rng.randint(50, 100000),
+            'weight': round(rng.uniform(1, 5), 4),
+            'weight_votes': rng.randint(0, 5000),
+            'rank': str(rng.randint(1, 30000)) if rng.random() < 0.9 else "Not Ranked",
+            'owned': rng.random() < 0.02,
+            'polls': [(str(player_count), rng.randint(0, 200), rng.randint(0, 200), rng.randint(0, 200))
+                      for player_count in range(1, max_players + 1)] + [(f"{max_players}+", 0, 0, rng.randint(0, 20))],
+        })
+
+    catalog.sort(key=lambda game: game['average'], reverse=True)
+    return catalog
+
+def game_kind(game):
+    return "boardgameexpansion" if game['expansion'] else "boardgame"
+
+def search_page_html(games):
+    """
+    Builds a search results page listing the given games, with the same table layout as BoardGameGeek.
+
+    Args:
+        games (list): The catalog entries on the page.
+
+    Returns:
+        str: The HTML of the page.
+    """
+    rows = []
+    for position, game in enumerate(games):
+        href = f"/{game_kind(game)}/{game['id']}/game-{game['id']}"
+        rows.append(f"""<tr id='row_' >
+<td class='collection_rank'><a name='{position}'></a>{position + 1}</td>
+<td class='collection_thumbnail'><a href="{href}"><img alt='Board Game: {escape(game['title'])}' src='pic.jpg' /></a></td>
+<td id='CEcell_objectname{position}' class='collection_objectname '>
+<div style='z-index:1000;' id='results_objectname{position}'><a href="{href}" class='primary'>{escape(game['title'])}</a> <span class='smallerfont dull'>({game['year']})</span></div>
+<p class='smallefont dull'>A synthetic game.</p></td>
+<td class='collection_bggrating' align='center'>{game['average'] - 1:.3f}</td>
+<td class='collection_bggrating' align='center'>{game['average']}</td>
+<td class='collection_bggrating' align='center'>{game['voters']}</td>
+<td class='collection_shop' align='center'></td>
+</tr>""")
+
+    return ("<!DOCTYPE html><html><head><title>Board Game Search</title></head><body><div id='maincontent'>"
+            "<table class='collection_table' id='collectionitems'><tr><th class='collection_rank'>Board Game Rank</th>"
+            "<th>Thumbnail image</th><th>Title</th><th>Geek Rating</th><th>Avg Rating</th><th>Num Voters</th><th>Shop</th></tr>"
+            + "\n".join(rows) + "</table></div></body></html>")
+
+def thing_xml(games):
+    """
+    Builds an XML API thing response for the given games, with their statistics and player count polls.
+
+    Args:
+        games (list): The catalog entries in the response.
+
+    Returns:
+        bytes: The body of the response.
+    """
+    items = []
+    for game in games:
+        polls = "".join(f'<results numplayers="{player_count}"><result value="Best" numvotes="{best}"/>'
+                        f'<result value="Recommended" numvotes="{recommended}"/>'
+                        f'<result value="Not Recommended" numvotes="{not_recommended}"/></results>'
+                        for player_count, best, recommended, not_recommended in game['polls'])
+        rank = "" if game['expansion'] else (f'<rank type="subtype" id="1" name="boardgame" friendlyname="Board Game Rank" '
+                                             f'value="{game["rank"]}" bayesaverage="{game["average"] - 1:.5f}"/>')
+        items.append(f'''<item type="{game_kind(game)}" id="{game['id']}">
+<thumbnail>https://example.com/pic.jpg</thumbnail>
+<name type="primary" sortindex="1" value={quoteattr(game['title'])}/>
+<description>A synthetic game.</description>
+<yearpublished value="{game['year']}"/>
+<poll name="suggested_numplayers" title="User Suggested Number of Players" totalvotes="{len(game['polls'])}">{polls}</poll>
+<poll name="language_dependence" title="Language Dependence" totalvotes="0"><results><result level="1" value="No necessary in-game text" numvotes="0"/></results></poll>
+<link type="boardgamecategory" id="1009" value="Abstract Strategy"/>
+<statistics page="1"><ratings><usersrated value="{game['voters']}"/><average value="{game['average']}"/><bayesaverage value="0"/>
+<ranks>{rank}<rank type="family" id="5497" name="strategygames" friendlyname="Strategy Game Rank" value="Not Ranked" bayesaverage="Not Ranked"/></ranks>
+<stddev value="1.5"/><median value="0"/><owned value="100"/><numweights value="{game['weight_votes']}"/><averageweight value="{game['weight']}"/></ratings></statistics>
+</item>''')
+
+    return ('<?xml version="1.0" encoding="utf-8"?><items termsofuse="https://boardgamegeek.com/xmlapi/termsofuse">'
+            + "".join(items) + "</items>").encode('utf-8')
+
+def collection_xml(games, subtype="boardgame", owned_ids=None):
+    """
+    Builds an XML API collection response listing the owned games of one subtype.
+
+    Args:
+        games (list): The catalog entries; only the owned games of the subtype are listed.
+        subtype (str): 'boardgame' or 'boardgameexpansion'.
+        owned_ids (set, optional): The IDs of the owned games, in place of the catalog's own ownership.
+
+    Returns:
+        bytes: The body of the response.
+    """
+    owned_games = [game for game in games if (game['id'] in owned_ids if owned_ids is not None else game['owned']) and game_kind(game) == subtype]
+    items = [f'''<item objecttype="thing" objectid="{game['id']}" subtype="{subtype}" collid="{i}">
+<name sortindex="1">{escape(game['title'])}</name><yearpublished>{game['year']}</yearpublished>
+<stats minplayers="1" maxplayers="{len(game['polls']) - 1}"><rating value="N/A"><usersrated value="{game['voters']}"/>
+<average value="{game['average']}"/><bayesaverage value="0"/></rating></stats>
+<status own="1" prevowned="0" fortrade="0" want="0" wanttoplay="0" wanttobuy="0" wishlist="0" preordered="0"/><numplays>0</numplays></item>'''
+             for i, game in enumerate(owned_games)]
+
+    return (f'<?xml version="1.0" encoding="utf-8" standalone="yes"?><items totalitems="{len(owned_games)}" '
+            'termsofuse="https://boardgamegeek.com/xmlapi/termsofuse">' + "".join(items) + "</items>").encode('utf-8')
+
+def catalog_game_data(catalog):
+    """
+    Builds the games and player count data dictionaries that a run would collect for a catalog.
+
+    Args:
+        catalog (list): The catalog entries.
+
+    Returns:
+        tuple: The games dictionary and the player count data dictionary, keyed by game ID.
+    """
+    games = {}
+    player_count_data_dict = {}
+
+    for game in catalog:
+        games[game['id']] = {
+            'Game Title': game['title'],
+            'Type': "Expansion" if game['expansion'] else "Base Game",
+            'Game ID': game['id'],
+            'Average Rating': game['average'],
+            'Number of Voters': game['voters'],
+            'Weight': round(game['weight'], 2),
+            'Weight Votes': game['weight_votes'],
+            'Owned': 'Owned' if game['owned'] else 'Not Owned',
+            'Year': str(game['year']),
+            'BGG Rank': float('inf') if game['expansion'] or game['rank'] == "Not Ranked" else game['rank'],
+        }
+        player_count_data_dict[game['id']] = {player_count: bgg.summarize_player_count_votes(*votes)
+                                              for player_count, *votes in game['polls'] if "+" not in player_count}
+
+    return games, player_count_data_dict
+
+def write_fixtures(directory, catalog, thing_batch_sizes=DEFAULT_THING_BATCH_SIZES):
+    """
+    Writes the fixtures for a catalog to a directory, so they can be inspected or kept with a set of results.
+
+    Args:
+        directory (str): The directory to write to; it is created if needed.
+        catalog (list): The catalog entries.
+        thing_batch_sizes (iterable): The sizes of the thing responses to write.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    for page_number in range(1, (len(catalog) - 1) // bgg.SEARCH_PAGE_SIZE + 2):
+        page_games = catalog[(page_number - 1) * bgg.SEARCH_PAGE_SIZE:page_number * bgg.SEARCH_PAGE_SIZE]
+        with open(os.path.join(directory, f"search_page_{page_number}.html"), 'w', encoding='utf-8') as file:
+            file.write(search_page_html(page_games))
+
+    for batch_size in thing_batch_sizes:
+        with open(os.path.join(directory, f"thing_{batch_size}.xml"), 'wb') as file:
+            file.write(thing_xml(catalog[:batch_size]))
+
+    for subtype in ("boardgame", "boardgameexpansion"):
+        with open(os.path.join(directory, f"collection_{subtype}.xml"), 'wb') as file:
+            file.write(collection_xml(catalog, subtype))
+
+def parse_search_pages(pages, parser):
+    return [bgg.parse_search_page(html, parser) for html in pages]
+
+def parse_thing_batch(content, parser):
+    return list(bgg.parse_thing_response(content, parser))
+
+def _report_peak_rss(func, connection):
+    # ru_maxrss starts from the RSS at the fork, so the growth from here on is the benchmark's own.
+    gc.collect()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    connection.send((rss_after - rss_before) * (1 if sys.platform == 'darwin' else 2 ** 10))
+    connection.close()
+
+def measure_peak_rss(func):
+    """
+    Measures the peak memory (RSS) a function adds to the process while it runs.
+
+    The function is run once in a child process forked from a clean fork server, so memory left over from
+    earlier benchmarks neither hides nor inflates the peak of this one. Unlike `tracemalloc`, this includes
+    the memory allocated outside of Python, such as the documents built by lxml.
+
+    Args:
+        func (callable): The function to measure, called without arguments. It is sent to the child
+                         process, so it must be picklable, such as a `functools.partial` of a module function.
+
+    Returns:
+        int: The peak memory added during the run in bytes, or None where there is no fork server or
+             `resource` module, such as on Windows.
+    """
+    if resource is None or 'forkserver' not in multiprocessing.get_all_start_methods():
+        return None
+
+    context = multiprocessing.get_context('forkserver')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_report_peak_rss, args=(func, sender))
+    process.start()
+    sender.close()
+    try:
+        peak_memory = receiver.recv()
+    except EOFError:
+        peak_memory = None
+    process.join()
+    return peak_memory
+
+def measure(func, repeat):
+    """
+    Times a function and measures its peak memory use.
+
+    The function is timed `repeat` times and the fastest run is kept, as the slower runs mostly
+    measure other activity on the machine. Memory is measured in a separate run in a child process,
+    see `measure_peak_rss`.
+
+    Args:
+        func (callable): The function to measure, called without arguments; it must be picklable.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        tuple: The fastest run time in seconds and the peak memory added during a run in bytes, or None
+               if it cannot be measured on this platform.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    return min(times), measure_peak_rss(func)
+
+def check_parser_parity(search_pages, thing_responses):
+    """
+    Checks that the lxml and BeautifulSoup parsers give the same results on the fixtures.
+
+    Returns:
+        list: The names of the fixtures the parsers disagree on.
+    """
+    mismatches = []
+    for name, html in search_pages.items():
+        if bgg.parse_search_page(html, 'lxml') != bgg.parse_search_page(html, 'bs4'):
+            mismatches.append(name)
+    for name, content in thing_responses.items():
+        if list(bgg.parse_thing_response(content, 'lxml')) != list(bgg.parse_thing_response(content, 'bs4')):
+            mismatches.append(name)
+    return mismatches
+
+def run_benchmarks(catalog_sizes=DEFAULT_CATALOG_SIZES, thing_batch_sizes=DEFAULT_THING_BATCH_SIZES, search_pages=10,
+                   parsers=('lxml', 'bs4'), repeat=5, seed=0):
+    """
+    Runs the benchmarks and prints each result as it is measured.
+
+    Search pages are measured by parsing them as `fetch_games` does, and thing responses by parsing them as
+    `update_boardgame_data` does. The output writers and the viewer's loader are measured on catalogs of
+    each of the given sizes, which gives a scaling curve when several sizes are given.
+
+    Args:
+        catalog_sizes (iterable): The numbers of games in the catalogs for the writers and the viewer.
+        thing_batch_sizes (iterable): The numbers of games in the thing responses to parse.
+        search_pages (int): The number of search pages to parse.
+        parsers (iterable): The parsers to measure, 'lxml' and/or 'bs4'.
+        repeat (int): The number of timed runs of each benchmark.
+        seed (int): The seed for the synthetic catalogs.
+
+    Returns:
+        list: One dictionary per benchmark with its name, item count, time, rate and peak memory.
+    """
+    results = []
+
+    def record(name, items, func):
+        seconds, peak_memory = measure(func, repeat)
+        result = {'name': name, 'items': items, 'seconds': seconds, 'items_per_second': items / seconds,
+                  'peak_memory_mb': peak_memory / 2 ** 20 if peak_memory is not None else None}
+        results.append(result)
+        peak_memory_text = f"{result['peak_memory_mb']:.1f}" if peak_memory is not None else "n/a"
+        print(f"{name:<40} {items:>9} {seconds * 1000:>11.1f} {result['items_per_second']:>13.0f} {peak_memory_text:>14}")
+
+    catalog = generate_catalog(max(search_pages * bgg.SEARCH_PAGE_SIZE, *thing_batch_sizes), seed)
+    pages = {f"search page {page_number}": search_page_html(catalog[(page_number - 1) * bgg.SEARCH_PAGE_SIZE:page_number * bgg.SEARCH_PAGE_SIZE])
+             for page_number in range(1, search_pages + 1)}
+    responses = {f"thing batch of {batch_size}": thing_xml(catalog[:batch_size]) for batch_size in thing_batch_sizes}
+
+    mismatches = check_parser_parity(pages, responses) if {'lxml', 'bs4'} <= set(parsers) else []
+    if mismatches:
+        print(f"Warning: the lxml and bs4 parsers disagree on: {', '.join(mismatches)}")
+
+    print(f"{'Benchmark':<40} {'Items':>9} {'Time (ms)':>11} {'Items/sec':>13} {'Peak RSS (MB)':>14}")
+
+    for parser in parsers:
+        record(f"search pages ({parser})", len(pages) * bgg.SEARCH_PAGE_SIZE,
+               functools.partial(parse_search_pages, list(pages.values()), parser))
+
+    for parser in parsers:
+        for batch_size, content in zip(thing_batch_sizes, responses.values()):
+            record(f"thing batch of {batch_size} ({parser})", batch_size,
+                   functools.partial(parse_thing_batch, content, parser))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for catalog_size in catalog_sizes:
+            games, player_count_data_dict = catalog_game_data(generate_catalog(catalog_size, seed))
+            rows = sum(map(len, player_count_data_dict.values()))
+            csv_filename = os.path.join(directory, f"{catalog_size}.csv")
+            npz_filename = os.path.join(directory, f"{catalog_size}.npz")
+
+            record(f"write CSV, {catalog_size} games", rows,
+                   functools.partial(bgg.write_merged_data_to_csv, games, player_count_data_dict, csv_filename))
+            record(f"write JSON, {catalog_size} games", catalog_size,
+                   functools.partial(bgg.write_merged_data_to_json, games, player_count_data_dict, os.path.join(directory, f"{catalog_size}.json")))
+            if bgg.np is not None:
+                record(f"write NPZ, {catalog_size} games", rows,
+                       functools.partial(bgg.write_merged_data_to_npz, games, player_count_data_dict, npz_filename))
+
+            if viewer is not None:
+                record(f"viewer load CSV, {catalog_size} games", rows, functools.partial(viewer.load_data, csv_filename))
+                if bgg.np is not None:
+                    record(f"viewer load NPZ, {catalog_size} games", rows, functools.partial(viewer.load_data, npz_filename))
+
+    if viewer is None:
+        print("The viewer benchmarks were skipped because PyQt5 or numpy is not installed.")
+
+    return results
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmark the parsers and writers of the BoardGameGeek player count scripts on synthetic data.")
+
+    parser.add_argument("-s", "--sizes", type=int, nargs='+', default=list(DEFAULT_CATALOG_SIZES), help="Numbers of games in the catalogs used for the writers and the viewer (default: 10000)")
+    parser.add_argument("--thing_batch_sizes", type=int, nargs='+', default=list(DEFAULT_THING_BATCH_SIZES), help="Numbers of games in the thing API responses to parse (default: 20 100 500)")
+    parser.add_argument("--search_pages", type=int, default=10, help="Number of search result pages to parse (default: 10)")
+    parser.add_argument("--parser", choices=['lxml', 'bs4'], action='append', help="Parser to measure; can be repeated (default: both)")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="Number of timed runs of each benchmark; the fastest is reported (default: 5)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic catalogs (default: 0)")
+    parser.add_argument("-o", "--output", help="JSON file to save the results to, for comparing runs")
+    parser.add_argument("--write_fixtures", metavar="DIRECTORY", help="Write the search page, thing and collection fixtures for a catalog of the first size to a directory, and exit")
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = get_args()
+
+    if args.write_fixtures:
+        write_fixtures(args.write_fixtures, generate_catalog(args.sizes[0], args.seed), args.thing_batch_sizes)
+        print(f"Fixtures written to {args.write_fixtures}.")
+    else:
+        results = run_benchmarks(args.sizes, args.thing_batch_sizes, args.search_pages, args.parser or ('lxml', 'bs4'), args.repeat, args.seed)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=4)
+            print(f"Results saved to {args.output}.")
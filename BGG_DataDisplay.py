@@ -1,221 +1,668 @@
 import sys
 import csv
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QHeaderView, QLineEdit, QTableView, QComboBox, QProgressDialog, QLabel, QCheckBox, QPushButton, QHBoxLayout 
-from PyQt5.QtGui import QStandardItemModel, QStandardItem
-from PyQt5.QtCore import Qt, QSortFilterProxyModel, QRegExp
+import inspect
+from itertools import chain, islice, repeat
+import numpy as np
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QLineEdit, QTableView, QComboBox, QProgressDialog, QLabel, QCheckBox, QPushButton, QHBoxLayout, QFormLayout, QDoubleSpinBox 
+from PyQt5.QtCore import Qt, QRegExp, QAbstractTableModel, QAbstractProxyModel, QModelIndex, QTimer, QThread, pyqtSignal
+
+# The columns added to the loaded data by score_columns
+SCORE_HEADERS = ["Player Count Score (unadjusted)", "Player Count Score", "Playable", "Score Factor"]
+
+# The scoring parameters that can be changed in the filter window, with their labels and step sizes
+SCORE_PARAMETERS = {
+    "best_vote_parameter": ("Best vote weight", 0.5),
+    "recommended_vote_parameter": ("Recommended vote weight", 0.5),
+    "not_vote_parameter": ("Not recommended vote weight", 0.5),
+    "playable_threshold": ("Playable threshold", 10),
+    "rating_weighting_factor": ("Rating weighting", 0.5),
+    "playercount_weighting_factor": ("Player count weighting", 0.5),
+}
+
+# Rows read in the first chunk, kept small so the table fills quickly, and in each chunk after it
+FIRST_CHUNK_SIZE = 1000
+CHUNK_SIZE = 50000
+
+def read_headers(file_name):
+    if file_name.endswith('.npz'):
+        with np.load(file_name) as arrays:
+            return arrays['columns'].tolist()
+    with open(file_name, newline='', encoding='utf-8') as csvfile:
+        return next(csv.reader(csvfile))
 
-def load_csv_data(file_name):
-    data = []
+def csv_column_chunks(file_name, chunk_sizes):
     with open(file_name, newline='', encoding='utf-8') as csvfile:
         reader = csv.reader(csvfile)
         headers = next(reader)
-        headers.extend(["Player Count Score (unadjusted)", "Player Count Score", "Playable", "Score Factor"])
-        data.append(headers)
-        
-        # Initialize the parameters
-        best_vote_parameter = 3
-        recommended_vote_parameter = 2
-        not_vote_parameter = -2
-        playable_threshold = 150
-        rating_weighting_factor = 3
-        playercount_weighting_factor = 1
-
-        for row in reader:
-            # Calculate the "Player Count Score (unadjusted)"
-            best_percent = float(row[headers.index("Best %")])
-            recommended_percent = float(row[headers.index("Recommended %")])
-            not_recommended_percent = float(row[headers.index("Not Recommended %")])
-
-            player_count_score_unadjusted = round(
-                best_percent * best_vote_parameter
-                + recommended_percent * recommended_vote_parameter
-                + not_recommended_percent * not_vote_parameter,1
-            )
-
-            # Append the calculated values as placeholders
-            row.extend([player_count_score_unadjusted, 0, "", 0])
-            data.append(row)
-
-    # Calculate the minimum and maximum "Player Count Score (unadjusted)"
-    min_score = min(float(row[headers.index("Player Count Score (unadjusted)")]) for row in data[1:])
-    max_score = max(float(row[headers.index("Player Count Score (unadjusted)")]) for row in data[1:])
-
-    # Update the "Player Count Score", "Playable", and "Score Factor" values
-    for row in data[1:]:
-        unadjusted_score = float(row[headers.index("Player Count Score (unadjusted)")])
-
-        # Normalize the "Player Count Score"
+        for chunk_size in chunk_sizes:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                return
+            yield {header: typed_column(values) for header, values in zip(headers, zip(*rows))}
+
+def npz_column_chunks(file_name, chunk_sizes):
+    # The NPZ output holds one typed array per column, so no text has to be parsed.
+    # String columns are stored as codes into a table of their distinct values.
+    with np.load(file_name) as arrays:
+        headers = arrays['columns'].tolist()
+        columns = {}
+        for header in headers:
+            if f"{header} strings" in arrays:
+                columns[header] = arrays[f"{header} strings"].astype(object)[arrays[header]]
+            else:
+                columns[header] = typed_column(arrays[header])
+
+    row_count = len(columns[headers[0]]) if headers else 0
+    start = 0
+    for chunk_size in chunk_sizes:
+        if start >= row_count:
+            return
+        yield {header: column[start:start + chunk_size] for header, column in columns.items()}
+        start += chunk_size
+
+def column_chunks(file_name, chunk_sizes=None):
+    # Read the file as a series of chunks of typed column arrays
+    if chunk_sizes is None:
+        chunk_sizes = chain([FIRST_CHUNK_SIZE], repeat(CHUNK_SIZE))
+    if file_name.endswith('.npz'):
+        return npz_column_chunks(file_name, chunk_sizes)
+    return csv_column_chunks(file_name, chunk_sizes)
+
+def concatenate_columns(headers, chunks):
+    if not chunks:
+        return {header: np.array([]) for header in headers}
+    return {header: np.concatenate([chunk[header] for chunk in chunks]) for header in headers}
+
+def typed_column(values):
+    # Columns whose values are all numbers become float arrays, and the others arrays of strings.
+    try:
+        return np.asarray(values, dtype=float)
+    except ValueError:
+        return np.asarray(values, dtype=object)
+
+def round_like_python(values, decimals):
+    # np.round scales by a power of ten before rounding, which can round a value lying within
+    # a rounding error of a halfway point differently from round(). Those few values are
+    # rounded again with round() so the results are bit-identical to it.
+    rounded = np.round(values, decimals)
+    scaled = values * 10.0 ** decimals
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(value, decimals) for value in values[near_half].tolist()]
+    return rounded
+
+def unadjusted_score_column(columns, best_vote_parameter=3, recommended_vote_parameter=2, not_vote_parameter=-2):
+    # Calculate the "Player Count Score (unadjusted)"
+    best_percent = np.asarray(columns["Best %"], dtype=float)
+    recommended_percent = np.asarray(columns["Recommended %"], dtype=float)
+    not_recommended_percent = np.asarray(columns["Not Recommended %"], dtype=float)
+    return round_like_python(
+        best_percent * best_vote_parameter
+        + recommended_percent * recommended_vote_parameter
+        + not_recommended_percent * not_vote_parameter, 1
+    )
+
+def normalized_score_columns(unadjusted_score, average_rating, score_range, rating_weighting_factor=3, playercount_weighting_factor=1):
+    if rating_weighting_factor + playercount_weighting_factor == 0:
+        raise ValueError("The rating and player count weightings must not add up to zero.")
+
+    # Normalize the "Player Count Score" between the minimum and maximum unadjusted scores.
+    # When every unadjusted score is the same there is nothing to spread out, so they all score 0.
+    min_score, max_score = score_range
+    if max_score == min_score:
+        player_count_score = np.zeros_like(unadjusted_score, dtype=float)
+    else:
         player_count_score = (unadjusted_score - min_score) / (max_score - min_score) * 10
-        row[headers.index("Player Count Score")] = "{:.2f}".format(player_count_score)
 
-        # Calculate the "Playable" value based on the threshold
-        row[headers.index("Playable")] = "Playable" if unadjusted_score >= playable_threshold else "Not Playable"
+    # Calculate the "Score Factor" from the unrounded "Player Count Score"
+    average_rating = np.asarray(average_rating, dtype=float)
+    score_factor = round_like_python(((average_rating * rating_weighting_factor) + (player_count_score * playercount_weighting_factor)) / (rating_weighting_factor + playercount_weighting_factor), 3)
+
+    return round_like_python(player_count_score, 2), score_factor
+
+def score_range(unadjusted_score):
+    return unadjusted_score.min(initial=np.inf), unadjusted_score.max(initial=-np.inf)
+
+def score_columns(columns, best_vote_parameter=3, recommended_vote_parameter=2, not_vote_parameter=-2,
+                  playable_threshold=150, rating_weighting_factor=3, playercount_weighting_factor=1, unadjusted_range=None):
+    # The scores are normalized over the given range of unadjusted scores, or else over the rows' own range
+    unadjusted_score = unadjusted_score_column(columns, best_vote_parameter, recommended_vote_parameter, not_vote_parameter)
+    player_count_score, score_factor = normalized_score_columns(
+        unadjusted_score, columns["Average Rating"], unadjusted_range or score_range(unadjusted_score),
+        rating_weighting_factor, playercount_weighting_factor)
+
+    return {
+        "Player Count Score (unadjusted)": unadjusted_score,
+        "Player Count Score": player_count_score,
+        "Playable": np.where(unadjusted_score >= playable_threshold, "Playable", "Not Playable"),
+        "Score Factor": score_factor,
+    }
+
+def add_scores(columns, **score_parameters):
+    scores = score_columns(columns, **score_parameters)
+    return {**columns, **{header: typed_column(values) for header, values in scores.items()}}
+
+def load_data(file_name, **score_parameters):
+    # Read the whole file at once, then add the score columns.
+    headers = read_headers(file_name)
+    columns = concatenate_columns(headers, list(column_chunks(file_name, repeat(CHUNK_SIZE))))
+    return headers + SCORE_HEADERS, add_scores(columns, **score_parameters)
+
+def rearrange_columns(headers):
+    # Show the "Score Factor" column first.
+    headers = list(headers)
+    headers.insert(0, headers.pop(headers.index("Score Factor")))
+    return headers
+
+class DataLoader(QThread):
+    # Reads and scores the file in chunks on a background thread. Each chunk is handed to the
+    # table as soon as it is read, and the filters are built once the whole file has been read.
+    chunk_loaded = pyqtSignal(object, object)
+    loaded = pyqtSignal(object)
+
+    def __init__(self, file_name, parent=None):
+        super().__init__(parent)
+        self.file_name = file_name
+        self.headers = read_headers(file_name) + SCORE_HEADERS
+
+    def run(self):
+        # Only the new rows are scored for display, against the range of unadjusted scores read so far.
+        # When that range grows, the table normalizes the earlier rows again.
+        chunks = []
+        unadjusted_range = (np.inf, -np.inf)
+        for chunk in column_chunks(self.file_name):
+            chunk_min, chunk_max = score_range(unadjusted_score_column(chunk))
+            new_range = (min(unadjusted_range[0], chunk_min), max(unadjusted_range[1], chunk_max))
+            range_grew = bool(chunks) and new_range != unadjusted_range
+            unadjusted_range = new_range
+            chunks.append(chunk)
+            self.chunk_loaded.emit(add_scores(chunk, unadjusted_range=unadjusted_range), unadjusted_range if range_grew else None)
+
+            # Stop reading when loading is cancelled, keeping the rows read so far
+            if self.isInterruptionRequested():
+                break
 
-        # Calculate the "Score\nFactor" value
-        average_rating = float(row[headers.index("Average Rating")])
-        score_factor = round(((average_rating * rating_weighting_factor) + (player_count_score * playercount_weighting_factor)) / (rating_weighting_factor + playercount_weighting_factor), 3)
-        row[headers.index("Score Factor")] = "{:.3f}".format(score_factor)
+        # Join the chunks once, and score every row together
+        columns = concatenate_columns(self.headers[:-len(SCORE_HEADERS)], chunks)
+        self.loaded.emit(FilterEngine(self.headers, add_scores(columns)))
 
-    return data
+class GameTableModel(QAbstractTableModel):
+    def __init__(self, headers, columns=None, parent=None):
+        super().__init__(parent)
+        self.headers = headers
+        self.header_labels = list(headers)
+        self.row_count = 0
+        self.buffers = {}
+        self.set_columns(columns or concatenate_columns(headers, []))
+
+    def set_columns(self, columns, changed_headers=()):
+        # Insert the rows that are new, and refresh the given columns of the rows that were already there
+        old_row_count = self.row_count
+        row_count = len(columns[self.headers[0]])
+        if row_count > old_row_count:
+            self.beginInsertRows(QModelIndex(), old_row_count, row_count - 1)
+
+        self.columns = [columns[header] for header in self.headers]
+        self.buffers = {}
+        self.numeric = [column.dtype.kind == 'f' for column in self.columns]
+        self.row_count = row_count
+
+        if row_count > old_row_count:
+            self.endInsertRows()
+        for header in changed_headers:
+            if old_row_count:
+                column = self.headers.index(header)
+                self.dataChanged.emit(self.index(0, column), self.index(old_row_count - 1, column), [Qt.DisplayRole])
+
+    def append_columns(self, chunk):
+        # Append the rows to arrays with spare room, which grow by doubling, so that each row
+        # is only copied a few times however many chunks are loaded
+        old_row_count = self.row_count
+        row_count = old_row_count + len(chunk[self.headers[0]])
+        if row_count == old_row_count:
+            return
+
+        self.beginInsertRows(QModelIndex(), old_row_count, row_count - 1)
+        for header in self.headers:
+            values = chunk[header]
+            buffer = self.buffers.get(header)
+            if buffer is None or len(buffer) < row_count or np.result_type(buffer, values) != buffer.dtype:
+                dtype = values.dtype if buffer is None else np.result_type(buffer, values)
+                new_buffer = np.empty(max(row_count, 2 * old_row_count), dtype=dtype)
+                if buffer is not None:
+                    new_buffer[:old_row_count] = buffer[:old_row_count]
+                buffer = self.buffers[header] = new_buffer
+            buffer[old_row_count:row_count] = values
+
+        self.columns = [self.buffers[header][:row_count] for header in self.headers]
+        self.numeric = [column.dtype.kind == 'f' for column in self.columns]
+        self.row_count = row_count
+        self.endInsertRows()
+
+    def normalize_scores(self, rows, unadjusted_range):
+        # Normalize the scores of the first rows again over a new range of unadjusted scores
+        player_count_score, score_factor = normalized_score_columns(
+            self.column("Player Count Score (unadjusted)")[:rows], self.column("Average Rating")[:rows], unadjusted_range)
+        self.column("Player Count Score")[:rows] = player_count_score
+        self.column("Score Factor")[:rows] = score_factor
+        for header in ("Player Count Score", "Score Factor"):
+            column = self.headers.index(header)
+            self.dataChanged.emit(self.index(0, column), self.index(rows - 1, column), [Qt.DisplayRole])
+
+    def column(self, header):
+        return self.columns[self.headers.index(header)]
+
+    def set_scores(self, **score_parameters):
+        # Recompute only the score columns from the loaded columns
+        columns = {header: self.column(header) for header in self.headers}
+        self.set_columns(add_scores(columns, **score_parameters), changed_headers=SCORE_HEADERS)
+
+    def set_header_labels(self, labels):
+        self.header_labels = [labels.get(header, header) for header in self.headers]
+        self.headerDataChanged.emit(Qt.Horizontal, 0, len(self.headers) - 1)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        return self.cell(index.row(), index.column(), role)
+
+    def cell(self, row, column, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+
+        value = self.columns[column][row]
+        if self.numeric[column]:
+            value = float(value)
+            # Unranked games have an infinite BGG Rank, which is shown as an empty cell
+            if value == float('inf'):
+                return ""
+        return value
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.header_labels[section]
+        return None
+
+class TitleIndex:
+    # A trigram index over the distinct lower-cased titles. A title can only contain the search
+    # text if it contains every three-letter piece of it, so only the titles listed under all of
+    # the text's trigrams have to be checked.
+    def __init__(self, titles):
+        titles, self.title_codes = np.unique([str(title).lower() for title in titles], return_inverse=True)
+        self.titles = titles.tolist()
+
+        trigrams = {}
+        for title_id, title in enumerate(self.titles):
+            for trigram in {title[i:i + 3] for i in range(len(title) - 2)}:
+                trigrams.setdefault(trigram, []).append(title_id)
+        self.trigrams = {trigram: np.array(title_ids) for trigram, title_ids in trigrams.items()}
+
+        self.last_text = None
+        self.last_hits = None
+
+    def search(self, text):
+        text = str(text).lower()
+        candidates = None
+
+        # When the text extends the previous search, only the previous hits can still match
+        if self.last_text is not None and self.last_text in text:
+            candidates = self.last_hits
+
+        # Keep the titles that contain every trigram of the text, starting with the rarest
+        if len(text) >= 3:
+            postings = [self.trigrams.get(trigram) for trigram in {text[i:i + 3] for i in range(len(text) - 2)}]
+            if any(title_ids is None for title_ids in postings):
+                postings = [np.array([], dtype=int)]
+            for title_ids in sorted(postings, key=len):
+                candidates = title_ids if candidates is None else np.intersect1d(candidates, title_ids, assume_unique=True)
+
+        if candidates is None:
+            candidates = np.arange(len(self.titles))
+
+        # Check the remaining titles for the whole text
+        hits = candidates[np.fromiter((text in self.titles[title_id] for title_id in candidates.tolist()), dtype=bool, count=len(candidates))]
+        self.last_text, self.last_hits = text, hits
+        return hits
+
+    def mask(self, text):
+        # Rows whose title contains the text
+        title_hits = np.zeros(len(self.titles), dtype=bool)
+        title_hits[self.search(text)] = True
+        return title_hits[self.title_codes]
+
+class FilterEngine:
+    # Answers the filters from boolean masks and sorted columns that are built once when the
+    # data is loaded, instead of looking at every row again each time a filter changes.
+    def __init__(self, headers, columns):
+        self.columns = columns
+        self.row_count = len(columns[headers[0]]) if headers else 0
+        self.value_masks = {}
+        self.sorted_columns = {}
+        self.lowered_text = {}
+        self.masks = {}
+        self.title_index = TitleIndex(columns["Game Title"])
+
+        for header in ("Owned", "Type", "Playable", "Player Count"):
+            self.build_value_masks(header)
+        for header in ("Year", "Average Rating", "Weight", "Player Count"):
+            self.build_sorted_column(header)
+
+    def build_value_masks(self, header):
+        # One mask for each distinct value in the column
+        values, codes = np.unique(self.columns[header], return_inverse=True)
+        self.value_masks[header] = {value: codes == code for code, value in enumerate(values.tolist())}
+
+    def build_sorted_column(self, header):
+        # The column's values in ascending order, and the row each of them came from
+        order = np.argsort(self.columns[header], kind='stable')
+        self.sorted_columns[header] = (order, self.columns[header][order])
+
+    def value_mask(self, header, value):
+        if header not in self.value_masks:
+            self.build_value_masks(header)
+        mask = self.value_masks[header].get(value)
+        return mask if mask is not None else np.zeros(self.row_count, dtype=bool)
+
+    def range_mask(self, header, minimum=None, maximum=None):
+        if header not in self.sorted_columns:
+            self.build_sorted_column(header)
+        order, sorted_values = self.sorted_columns[header]
+
+        # Binary search for the rows between the minimum and maximum, both included
+        start = 0 if minimum is None else np.searchsorted(sorted_values, minimum, side='left')
+        end = len(sorted_values) if maximum is None else np.searchsorted(sorted_values, maximum, side='right')
+        mask = np.zeros(self.row_count, dtype=bool)
+        mask[order[start:end]] = True
+        return mask
+
+    def text_mask(self, header, text):
+        if header == "Game Title":
+            return self.title_index.mask(text)
+        if header not in self.lowered_text:
+            self.lowered_text[header] = [str(value).lower() for value in self.columns[header]]
+        text = str(text).lower()
+        return np.fromiter((text in value for value in self.lowered_text[header]), dtype=bool, count=self.row_count)
+
+    def set_column(self, header, values):
+        # Rebuild what was built from a column whose values have changed
+        self.columns[header] = values
+        if header in self.value_masks:
+            self.build_value_masks(header)
+        if header in self.sorted_columns:
+            self.build_sorted_column(header)
+        self.lowered_text.pop(header, None)
+
+    def set_mask(self, name, mask):
+        if mask is None:
+            self.masks.pop(name, None)
+        else:
+            self.masks[name] = mask
 
-def rearrange_data_columns(data):
-    
-    score_factor_index = data[0].index("Score Factor")
-    
-    for row in data:
-        score_factor = row.pop(score_factor_index)
-        row.insert(0, score_factor)
-    
-    return data
+    def accepted(self):
+        # A row is shown when every active filter accepts it
+        accepted = np.ones(self.row_count, dtype=bool)
+        for mask in self.masks.values():
+            accepted &= mask
+        return accepted
 
-class CumulativeFilterProxyModel(QSortFilterProxyModel):
+class CumulativeFilterProxyModel(QAbstractProxyModel):
     def __init__(self, headers, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.headers = headers
+
+        # The filter engine arrives once the data has loaded. Until then the filters are only
+        # recorded, as functions that make each filter's mask from the engine.
+        self.engine = None
         self.filters = {}
-        self.text_filter = None
-        self.player_count_filter = None
-        self.min_year = None  # Initialize min_year
-        self.max_year = None  # Initialize max_year
-        self.min_avg_rating = None
-        self.max_avg_rating = None
-        self.min_weight = None
-        self.max_weight = None
+
+        # Source rows in sorted order, the visible ones among them, and the proxy row of each source row.
+        # The sorted order for each column and direction is worked out once and kept until the data changes.
+        self.sort_column = None
+        self.sort_direction = Qt.AscendingOrder
+        self.sort_permutations = {}
+        self.sort_order = np.arange(0)
+        self.rows = self.sort_order
+        self.positions = np.arange(0)
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.rowsInserted.connect(self.source_rows_inserted)
+        model.dataChanged.connect(self.source_data_changed)
+
+    def source_rows_inserted(self, parent, first, last):
+        self.sort_permutations.clear()
+        self.update_rows()
+
+    def source_data_changed(self, top_left, bottom_right, roles=()):
+        # Forget the sorted orders of the changed columns, and sort again if the view is sorted by one of them
+        changed_columns = range(top_left.column(), bottom_right.column() + 1)
+        for column in changed_columns:
+            self.sort_permutations.pop((column, Qt.AscendingOrder), None)
+            self.sort_permutations.pop((column, Qt.DescendingOrder), None)
+        if self.sort_column in changed_columns:
+            self.sort_order = self.sort_permutation()
+
+        # Filter the changed columns' new values
+        if self.engine is not None:
+            for column in changed_columns:
+                self.engine.set_column(self.headers[column], self.sourceModel().column(self.headers[column]))
+            self.apply_filters()
+
+        if self.sort_column in changed_columns or self.engine is not None:
+            self.update_rows()
+
+        # Refresh the changed columns in every row
+        if self.rows.size:
+            self.dataChanged.emit(self.index(0, top_left.column()), self.index(len(self.rows) - 1, bottom_right.column()), roles)
+
+    def set_engine(self, engine):
+        self.engine = engine
+        self.apply_filters()
+        self.update_rows()
+
+    def apply_filters(self):
+        for name, make_mask in self.filters.items():
+            self.engine.set_mask(name, make_mask(self.engine))
+
+    def set_filter_mask(self, name, make_mask):
+        self.filters[name] = make_mask
+        if self.engine is not None:
+            self.engine.set_mask(name, make_mask(self.engine))
+            self.update_rows()
 
     def set_filter(self, column, filter_value):
-        if filter_value:
-            self.filters[column] = filter_value
-        elif column in self.filters:
-            del self.filters[column]
-        self.invalidateFilter()
+        header = self.headers[column]
+        self.set_filter_mask(("value", column), lambda engine: engine.value_mask(header, filter_value) if filter_value else None)
         
     def set_text_filter(self, column, text):
-        self.text_filter = (column, text)
-        self.invalidateFilter()
+        header = self.headers[column]
+        self.set_filter_mask("text", lambda engine: engine.text_mask(header, text) if text else None)
         
     def set_player_count_filter(self, column, player_count_filter):
-        self.player_count_filter = (column, player_count_filter)
-        self.invalidateFilter()
+        header = self.headers[column]
+
+        def make_mask(engine):
+            if player_count_filter is None:
+                return None
+            if player_count_filter == 8:
+                return engine.range_mask(header, minimum=8)
+            return engine.value_mask(header, int(player_count_filter))
+
+        self.set_filter_mask("player count", make_mask)
         
+    def set_range_filter(self, header, minimum, maximum):
+        self.set_filter_mask(header, lambda engine: engine.range_mask(header, minimum, maximum) if minimum is not None or maximum is not None else None)
+
     def set_year_filter(self, min_year, max_year):
-        self.min_year = min_year
-        self.max_year = max_year
-        self.invalidateFilter()
+        self.set_range_filter("Year", min_year, max_year)
         
     def set_avg_rating_filter(self, min_avg_rating, max_avg_rating):
-        self.min_avg_rating = min_avg_rating
-        self.max_avg_rating = max_avg_rating
-        self.invalidateFilter()
+        self.set_range_filter("Average Rating", min_avg_rating, max_avg_rating)
 
     def set_weight_filter(self, min_weight, max_weight):
-        self.min_weight = min_weight
-        self.max_weight = max_weight
-        self.invalidateFilter()
-    
-    def filterAcceptsRow(self, source_row, source_parent):
-           
-        for column, filter_value in self.filters.items():
-            index = self.sourceModel().index(source_row, column, source_parent)
-            data = self.sourceModel().data(index)
-
-            # Compare the data and filter value as strings
-            data_str = str(data)
-            filter_value_str = str(filter_value)
-
-            if data_str != filter_value_str:
-                return False
-
-        if self.text_filter:
-            column, text = self.text_filter
-            index = self.sourceModel().index(source_row, column, source_parent)
-            data = self.sourceModel().data(index)
-
-            # Convert the data back to text if it's a number
-            if isinstance(data, (int, float)):
-                data = str(data)
-
-            if str(text).lower() not in str(data).lower():
-                return False
-
-        if self.player_count_filter is not None:
-            column, filter_count = self.player_count_filter
-            index = self.sourceModel().index(source_row, column, source_parent)
-            player_count = int(self.sourceModel().data(index))     
-            
-            if filter_count is None:
-                pass
-            elif filter_count == 8:
-                if player_count < 8:
-                    return False
+        self.set_range_filter("Weight", min_weight, max_weight)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # Nothing changes when the view is already sorted this way
+        if (column, order) == (self.sort_column, self.sort_direction) and len(self.sort_order) == self.sourceModel().rowCount():
+            return
+
+        self.sort_column = column
+        self.sort_direction = order
+        self.sort_order = self.sort_permutation()
+        self.update_rows()
+
+    def sort_permutation(self):
+        row_count = self.sourceModel().rowCount()
+        if self.sort_column is None:
+            return np.arange(row_count)
+
+        key = (self.sort_column, self.sort_direction)
+        if key not in self.sort_permutations:
+            values = self.sourceModel().column(self.headers[self.sort_column])
+            if self.sort_direction == Qt.AscendingOrder:
+                self.sort_permutations[key] = np.argsort(values, kind='stable')
             else:
-                if player_count != int(filter_count):
-                    return False              
-                    
-        # Year filter logic
-        if self.min_year is not None or self.max_year is not None:
-            year_index = self.sourceModel().index(source_row, self.headers.index("Year"), source_parent)
-            year = int(self.sourceModel().data(year_index))
-
-            if self.min_year is not None and year < self.min_year:
-                return False
-            if self.max_year is not None and year > self.max_year:
-                return False
-         
-        # Average Rating filter logic
-        if self.min_avg_rating is not None or self.max_avg_rating is not None:
-            avg_rating_index = self.sourceModel().index(source_row, self.headers.index("Average Rating"), source_parent)
-            avg_rating = float(self.sourceModel().data(avg_rating_index))
-
-            if (self.min_avg_rating is not None and avg_rating < self.min_avg_rating) or \
-               (self.max_avg_rating is not None and avg_rating > self.max_avg_rating):
-                return False
-
-        # Weight filter logic
-        if self.min_weight is not None or self.max_weight is not None:
-            weight_index = self.sourceModel().index(source_row, self.headers.index("Weight"), source_parent)
-            weight = float(self.sourceModel().data(weight_index))
-
-            if (self.min_weight is not None and weight < self.min_weight) or \
-               (self.max_weight is not None and weight > self.max_weight):
-                return False         
-
-        return True
+                # Sort the reversed column and reverse the result, so equal values keep their order
+                self.sort_permutations[key] = row_count - 1 - np.argsort(values[::-1], kind='stable')[::-1]
+        return self.sort_permutations[key]
+
+    def update_rows(self):
+        self.layoutAboutToBeChanged.emit()
+        old_rows = self.rows
+
+        # Sort again when rows have been added
+        row_count = self.sourceModel().rowCount()
+        if len(self.sort_order) != row_count:
+            self.sort_order = self.sort_permutation()
+
+        # Show the sorted rows that every filter accepts
+        if self.engine is None:
+            self.rows = self.sort_order
+        else:
+            self.rows = self.sort_order[self.engine.accepted()[self.sort_order]]
+        self.positions = np.full(row_count, -1)
+        self.positions[self.rows] = np.arange(len(self.rows))
+
+        # Move persistent indexes, such as the selection, to where their rows are now
+        old_indexes = self.persistentIndexList()
+        new_indexes = []
+        for index in old_indexes:
+            row = self.positions[old_rows[index.row()]]
+            new_indexes.append(self.index(int(row), index.column()) if row >= 0 else QModelIndex())
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < len(self.rows) and 0 <= column < len(self.headers)):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(int(self.rows[proxy_index.row()]), proxy_index.column())
+
+    def data(self, index, role=Qt.DisplayRole):
+        # Read the cell straight from the source model rather than through mapToSource
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return self.sourceModel().cell(int(self.rows[index.row()]), index.column(), role)
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = self.positions[source_index.row()]
+        return self.index(int(row), source_index.column()) if row >= 0 else QModelIndex()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal:
+            return self.sourceModel().headerData(section, orientation, role) if self.sourceModel() else None
+        return section + 1 if role == Qt.DisplayRole else None
 
 class MainWindow(QMainWindow):
-    def __init__(self, data):
+    def __init__(self, loader):
         super().__init__()
 
-        self.data = data
+        self.loader = loader
+        self.headers = rearrange_columns(loader.headers)
         
         self.setWindowTitle("Game Data")
         
-        # Create the table view and its model
+        # Create the table view and its model, which reads cells straight from the column arrays
         self.table_view = QTableView()
-        self.model = QStandardItemModel()
-        self.table_view.setModel(self.model)
+        self.model = GameTableModel(self.headers)
         self.setCentralWidget(self.table_view)
 
-        # Set up the table view
-        self.setup_table(data)
-        self.bold_headers()
-        
-        # Create a QSortFilterProxyModel for filtering
-        self.proxy_model = CumulativeFilterProxyModel(self.data[0], parent=self.table_view)
+        # Create a proxy model for filtering and sorting
+        self.proxy_model = CumulativeFilterProxyModel(self.headers, parent=self.table_view)
         self.proxy_model.setSourceModel(self.model)
-        self.proxy_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
         self.table_view.setModel(self.proxy_model)
 
-        # Create and show the filter window
+        # Set up the table view
+        self.setup_table()
+        self.bold_headers()
+
+        # Create and show the filter window, which is enabled once the data has loaded
         self.filter_window = FilterWindow(self)
+        self.filter_window.setEnabled(False)
         self.filter_window.show()
 
+        # Show the rows as the loader reads them
+        self.progress_dialog = QProgressDialog("Loading data...", "Cancel", 0, 0, self)
+        self.progress_dialog.setWindowTitle("Loading Data")
+        self.progress_dialog.setMinimumDuration(0)
+        self.progress_dialog.setMinimumWidth(500)  # Set the minimum width of the progress dialog
+        self.progress_dialog.canceled.connect(self.loader.requestInterruption)
+        self.loader.chunk_loaded.connect(self.add_rows)
+        self.loader.loaded.connect(self.finish_loading)
+
         # Resize the main window to fit the table columns
-        self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table_view.horizontalHeader().setResizeContentsPrecision(200)
+        self.table_view.resizeColumnsToContents()
         self.resize(self.table_view.horizontalHeader().length()+100, 1200)
         
         self.sort_by_score_factor()  # Add this line to sort by Score Factor on load
         
+    def add_rows(self, columns, unadjusted_range):
+        old_row_count = self.model.rowCount()
+        self.model.append_columns(columns)
+        # The scores of the rows already shown change when the range of scores grows
+        if unadjusted_range is not None:
+            self.model.normalize_scores(old_row_count, unadjusted_range)
+        self.progress_dialog.setLabelText(f"Loading data... ({self.model.rowCount()} rows)")
+
+        # Fit the columns to the first few hundred rows once, rather than measuring every cell again whenever rows change
+        if old_row_count == 0:
+            self.table_view.resizeColumnsToContents()
+            self.resize(self.table_view.horizontalHeader().length()+100, 1200)
+
+    def finish_loading(self, engine):
+        self.progress_dialog.reset()
+        # Show the columns the filters were built from, which were scored all together
+        self.model.set_columns(engine.columns, changed_headers=SCORE_HEADERS)
+        self.proxy_model.set_engine(engine)
+        self.filter_window.setEnabled(True)
+
     def closeEvent(self, event):
+        # Stop the loader before the window goes away
+        self.loader.requestInterruption()
+        self.loader.wait()
         self.filter_window.close()
         event.accept()    
 
@@ -224,68 +671,23 @@ class MainWindow(QMainWindow):
         header_font.setBold(True)
         self.table_view.horizontalHeader().setFont(header_font)
 
-    def setup_table(self, data):
-        # Set the row and column count
-        self.model.setRowCount(len(data) - 1)
-        self.model.setColumnCount(len(data[0]))
-        
-        # Set the horizontal headers        
-        headers = ["Score\nFactor","Game Title", "Game\nID", "Year", "BGG Rank", "Average\nRating", "Number\nof\n Voters", "Weight", "Weight\nVotes", "Owned", "Type", "Player\nCount", "Best\n%", "Best\nVotes", "Rec.\n%", "Rec.\nVotes", "Not\n%", "Not\nVotes", "Total\nVotes", "Player\nCount\nScore\n(unadjusted)", "Player\nCount\nScore", "Playable"]
-        
-        self.model.setHorizontalHeaderLabels(headers)
+    def setup_table(self):
+        # Set the horizontal headers
+        self.model.set_header_labels({
+            "Score Factor": "Score\nFactor", "Game ID": "Game\nID", "Average Rating": "Average\nRating",
+            "Number of Voters": "Number\nof\n Voters", "Weight Votes": "Weight\nVotes", "Player Count": "Player\nCount",
+            "Best %": "Best\n%", "Best Votes": "Best\nVotes", "Recommended %": "Rec.\n%", "Recommended Votes": "Rec.\nVotes",
+            "Not Recommended %": "Not\n%", "Not Recommended Votes": "Not\nVotes", "Vote Count": "Total\nVotes",
+            "Player Count Score (unadjusted)": "Player\nCount\nScore\n(unadjusted)", "Player Count Score": "Player\nCount\nScore",
+        })
 
         # Hide the vertical header
         self.table_view.verticalHeader().hide()
 
-        # Create the progress dialog
-        progress_dialog = QProgressDialog("Loading data...", "Cancel", 0, len(data) - 1, self)
-        progress_dialog.setWindowTitle("Loading Data")
-        progress_dialog.setWindowModality(Qt.WindowModal)
-        progress_dialog.setMinimumDuration(0)
-        progress_dialog.setValue(0)
-        progress_dialog.setMinimumWidth(500)  # Set the minimum width of the progress dialog
-
-        # Populate the table view
-        for row in range(1, len(data)):
-            for col in range(len(data[row])):
-                cell_value = str(data[row][col])
-                # Check if the value is 'inf' and replace with empty string for display
-                if cell_value == float('inf'):
-                    item = QStandardItem("")
-                else:
-                    item = QStandardItem(cell_value)
-
-                # Check if the value in the first row is numeric
-                try:
-                    float(data[1][col])  # Check if the value can be cast to a float
-                    is_numeric = True
-                except ValueError:
-                    is_numeric = False
-
-                # If the value is numeric, set the data type to a number
-                if is_numeric:
-                    try:
-                        number = float(data[row][col])
-                    except ValueError:
-                        number = int(data[row][col])
-                    item.setData(number, Qt.DisplayRole)
-                else:
-                    item.setData(cell_value, Qt.DisplayRole)
-
-                self.model.setItem(row - 1, col, item)
-
-            # Update the progress dialog
-            progress_dialog.setValue(row)
-            progress_dialog.setLabelText(f"Loading data... ({row}/{len(data) - 1})")  # Update the label text with progress
-            QApplication.processEvents()
-            if progress_dialog.wasCanceled():
-                break
-
         # Set the table view properties
         self.table_view.setSortingEnabled(True)
         
-        header_row = self.data[0]
-        player_count_score_unadjusted_index = header_row.index("Player Count Score (unadjusted)")
+        player_count_score_unadjusted_index = self.headers.index("Player Count Score (unadjusted)")
 
         # Hide the "Player Count Score (unadjusted)" column
         header = self.table_view.horizontalHeader()
@@ -293,54 +695,49 @@ class MainWindow(QMainWindow):
 
 
     def filter_game_title(self, text):
-        self.proxy_model.set_text_filter(self.data[0].index("Game Title"), text)
+        self.proxy_model.set_text_filter(self.headers.index("Game Title"), text)
 
     def filter_playable(self, text):
         if text == "All":
-            self.proxy_model.set_filter(self.data[0].index("Playable"), None) 
+            self.proxy_model.set_filter(self.headers.index("Playable"), None) 
         else:
-            self.proxy_model.set_filter(self.data[0].index("Playable"), text)
+            self.proxy_model.set_filter(self.headers.index("Playable"), text)
             
         self.sort_by_score_factor()
          
     def filter_owned(self, text):
         if text == "All":
-            self.proxy_model.set_filter(self.data[0].index("Owned"), None)  
+            self.proxy_model.set_filter(self.headers.index("Owned"), None)  
         else:
-            self.proxy_model.set_filter(self.data[0].index("Owned"), text)
+            self.proxy_model.set_filter(self.headers.index("Owned"), text)
             
         self.sort_by_score_factor()
         
     def filter_type(self, text):
         if text == "All":
-            self.proxy_model.set_filter(self.data[0].index("Type"), None) 
+            self.proxy_model.set_filter(self.headers.index("Type"), None) 
         else:
-            self.proxy_model.set_filter(self.data[0].index("Type"), text)
+            self.proxy_model.set_filter(self.headers.index("Type"), text)
             
         self.sort_by_score_factor()     
         
     def filter_player_count(self, text):
         if text == "All":
-            self.proxy_model.set_player_count_filter(self.data[0].index("Player Count"), None)
+            self.proxy_model.set_player_count_filter(self.headers.index("Player Count"), None)
         elif text == "8+":
-            self.proxy_model.set_player_count_filter(self.data[0].index("Player Count"), 8)
+            self.proxy_model.set_player_count_filter(self.headers.index("Player Count"), 8)
         else:
             player_count = int(text)
-            self.proxy_model.set_player_count_filter(self.data[0].index("Player Count"), player_count)
+            self.proxy_model.set_player_count_filter(self.headers.index("Player Count"), player_count)
             
         self.sort_by_score_factor()
 
         
-    def sort_by_score_factor(self):
-        header = self.table_view.horizontalHeader()
-        score_factor_index = header.logicalIndex(header.count() - 1)  # Default to the last column in case the header is not found
-        
-        for i in range(header.count()):
-            if header.model().headerData(i, Qt.Horizontal) == "Score\nFactor":
-                score_factor_index = i
-                break
+    def rescore(self, score_parameters):
+        self.model.set_scores(**score_parameters)
 
-        self.table_view.sortByColumn(score_factor_index, Qt.DescendingOrder)
+    def sort_by_score_factor(self):
+        self.table_view.sortByColumn(self.headers.index("Score Factor"), Qt.DescendingOrder)
 
 class FilterWindow(QWidget):
     def __init__(self, main_window):
@@ -360,7 +757,12 @@ class FilterWindow(QWidget):
         # Game Title filter
         layout.addWidget(QLabel("Game Title:"))
         self.game_title_filter = QLineEdit()
-        self.game_title_filter.textChanged.connect(self.main_window.filter_game_title)
+        # Wait for a short pause in typing before filtering
+        self.game_title_timer = QTimer(self)
+        self.game_title_timer.setSingleShot(True)
+        self.game_title_timer.setInterval(150)
+        self.game_title_timer.timeout.connect(self.set_game_title_filter)
+        self.game_title_filter.textChanged.connect(lambda text: self.game_title_timer.start())
         layout.addWidget(self.game_title_filter)
 
         # Owned filter
@@ -446,12 +848,53 @@ class FilterWindow(QWidget):
         weight_filter_layout.addWidget(self.weight_filter_button)
         layout.addLayout(weight_filter_layout)
 
+        # Scoring parameters, which rescore the loaded data when changed
+        layout.addWidget(QLabel("\nScoring:"))
+        score_defaults = inspect.signature(score_columns).parameters
+        self.score_parameter_inputs = {}
+        scoring_layout = QFormLayout()
+        for parameter, (label, step) in SCORE_PARAMETERS.items():
+            parameter_input = QDoubleSpinBox()
+            parameter_input.setRange(-1000, 1000)
+            parameter_input.setDecimals(1)
+            parameter_input.setSingleStep(step)
+            parameter_input.setValue(score_defaults[parameter].default)
+            parameter_input.valueChanged.connect(lambda value: self.score_timer.start())
+            scoring_layout.addRow(label, parameter_input)
+            self.score_parameter_inputs[parameter] = parameter_input
+        layout.addLayout(scoring_layout)
+
+        # Wait for a short pause in changes before rescoring
+        self.score_timer = QTimer(self)
+        self.score_timer.setSingleShot(True)
+        self.score_timer.setInterval(150)
+        self.score_timer.timeout.connect(self.set_score_parameters)
+
+        self.reset_scoring_button = QPushButton("Reset Scoring")
+        self.reset_scoring_button.clicked.connect(self.reset_score_parameters)
+        layout.addWidget(self.reset_scoring_button)
+
         # Set the layout to the filter window and set its size
         layout.setContentsMargins(50, 50, 50, 50)
         self.setLayout(layout)
         self.setMinimumSize(400, 300)
         self.setWindowFlags(Qt.WindowStaysOnTopHint)
         
+    def set_game_title_filter(self):
+        self.main_window.filter_game_title(self.game_title_filter.text())
+
+    def set_score_parameters(self):
+        # Keep the current scores while the weightings add up to zero, which leaves nothing to divide by
+        try:
+            self.main_window.rescore({parameter: parameter_input.value() for parameter, parameter_input in self.score_parameter_inputs.items()})
+        except ValueError:
+            pass
+
+    def reset_score_parameters(self):
+        score_defaults = inspect.signature(score_columns).parameters
+        for parameter, parameter_input in self.score_parameter_inputs.items():
+            parameter_input.setValue(score_defaults[parameter].default)
+
     def set_year_filter(self):
         min_year = int(self.min_year_filter.text()) if self.min_year_filter.text() else None
         max_year = int(self.max_year_filter.text()) if self.max_year_filter.text() else None
@@ -474,11 +917,13 @@ class FilterWindow(QWidget):
 if __name__ == '__main__':
     app = QApplication(sys.argv)
 
-    data = load_csv_data('PlayerCountDataList.csv')
-    data = rearrange_data_columns(data)     
+    # Load the file given on the command line, or the collector's default CSV output.
+    file_name = sys.argv[1] if len(sys.argv) > 1 else 'PlayerCountDataList.csv'
+    loader = DataLoader(file_name)
     
-    main_window = MainWindow(data)
+    main_window = MainWindow(loader)
     main_window.show()
+    loader.start()
 
     sys.exit(app.exec_())
 
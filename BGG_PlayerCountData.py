@@ -1,35 +1,742 @@
 import re
+import io
 from bs4 import BeautifulSoup
+from lxml import etree
+import lxml.html
 from fake_useragent import UserAgent
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
 import csv
 from tqdm.auto import tqdm
 import time
 import argparse
 import json
+import logging
+import math
+import os
+import random
+import queue
+import sqlite3
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from functools import partial
+from itertools import islice
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
 
 # Below are the imports required for the script to function properly:
 # - `re`: module for using regular expressions.
 # - `BeautifulSoup`: library for parsing HTML and XML documents.
+# - `etree`, `lxml.html`: lxml's XML and HTML parsers, used for fast parsing of pages and API responses.
 # - `UserAgent`: tool for generating random user agent strings.
 # - `requests`: library for making HTTP requests.
+# - `HTTPAdapter`, `make_headers`: used to size the session's connection pool and to ask for compressed responses.
 # - `csv`: module for reading and writing CSV files.
 # - `tqdm`: tool for creating progress meters.
 # - `time`: module for working with time-related tasks.
+# - `threading`, `concurrent.futures`: used to run several requests at once in concurrent mode.
+# - `sqlite3`: module used to store the on-disk response cache.
+# - `logging`: module used to record the adaptive controller's decisions.
+# - `orjson`: optional fast JSON serializer for NDJSON output; the standard `json` module is used without it.
+# - `numpy`: optional, only needed for the columnar NPZ output.
+# - `resource`: used to report the peak memory of the run; not available on Windows.
+
+logger = logging.getLogger(__name__)
+
+# Number of games listed on each BoardGameGeek search results page.
+SEARCH_PAGE_SIZE = 100
+
+# Game details filled in from the thing API, as opposed to those found on search pages and in collections.
+ENRICHED_FIELDS = ('Year', 'Weight', 'Weight Votes', 'BGG Rank')
+
+# Column types of the NPZ output, in the same order as the CSV columns. String columns are
+# stored as integer codes into a table of their distinct values.
+NPZ_COLUMN_TYPES = {
+    'Game Title': 'str',
+    'Game ID': 'int64',
+    'Year': 'int32',
+    'BGG Rank': 'float64',
+    'Average Rating': 'float64',
+    'Number of Voters': 'int64',
+    'Weight': 'float64',
+    'Weight Votes': 'int64',
+    'Owned': 'str',
+    'Type': 'str',
+    'Player Count': 'int32',
+    'Best %': 'float64',
+    'Best Votes': 'int64',
+    'Recommended %': 'float64',
+    'Recommended Votes': 'int64',
+    'Not Recommended %': 'float64',
+    'Not Recommended Votes': 'int64',
+    'Vote Count': 'int64',
+}
+
+# Site the requests are sent to, unless --base_url points them somewhere else.
+DEFAULT_BASE_URL = "https://boardgamegeek.com"
+
+# Number of keep-alive connections the session keeps open to each host, unless --pool_size is given or more requests can run at once.
+DEFAULT_POOL_SIZE = 10
+
+# Seconds to wait for a connection to be made and for the server to send data, before the request is retried.
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 60
+
+# Response encodings to accept: gzip and deflate, plus brotli (and zstd) when a decoder for them is installed.
+ACCEPT_ENCODING = make_headers(accept_encoding=True)['accept-encoding']
+
+# How long to wait for BoardGameGeek to prepare a queued collection (202 replies), in seconds, and the
+# first and longest waits between polls.
+DEFAULT_COLLECTION_QUEUE_TIMEOUT = 300
+COLLECTION_POLL_FIRST_WAIT = 2
+COLLECTION_POLL_MAX_WAIT = 30
+
+# Attempts made for each half of a failed thing batch while it is being split to isolate bad IDs,
+# and the most times a batch is split, enough to bring a batch of 256 games down to single games.
+BISECT_MAX_RETRIES = 2
+BISECT_MAX_DEPTH = 8
+
+# Upper bounds, in seconds, of the request latency histogram buckets in the run report.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Response cache file used when --cache or --offline is given without a path.
+DEFAULT_CACHE_FILE = "bgg_cache.sqlite"
+
+# How long, in hours, cached responses stay fresh for each endpoint.
+DEFAULT_CACHE_TTLS = {
+    'search': 12,
+    'collection': 1,
+    'thing': 24,
+}
 
 def get_args():
     parser = argparse.ArgumentParser(description="Fetch and process game data from BoardGameGeek.")
     
     # Step 3: Adding command-line arguments
-    parser.add_argument("-u", "--username", default="Percy0715", help="BoardGameGeek username (default: Percy0715)")
+    parser.add_argument("-u", "--username", nargs='+', help="BoardGameGeek username, or several usernames to write one output for each (default: Percy0715)")
+    parser.add_argument("--usernames_file", help="File with more BoardGameGeek usernames, one per line")
     parser.add_argument("-f", "--fetch", type=int, default=5000, help="Number of games to fetch (default: 5000)")
     parser.add_argument("-o", "--output", default="PlayerCountDataList", help="Output filename (default: PlayerCountDataList.csv)")
     parser.add_argument("-b", "--batch_size", type=int, default=100, help="Batch size for processing games in batches from API call (default: 100)")    
-    parser.add_argument("-t", "--output_type", choices=['csv', 'json'], default='csv', help="Output format: 'csv' or 'json' (default: csv)")
+    parser.add_argument("-t", "--output_type", choices=['csv', 'json', 'ndjson', 'npz'], default='csv',
+                        help="Output format: 'csv', 'json', 'ndjson' (one game per line) or 'npz' (NumPy column arrays) (default: csv)")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="Number of requests to run at once; 1 fetches everything serially (default: 1)")
+    parser.add_argument("-p", "--pipeline", action="store_true", help="Start requesting game details while search pages are still being fetched")
+    parser.add_argument("-i", "--incremental", metavar="PREVIOUS_FILE", help="Reuse the details in a previous CSV or JSON output and only fetch details for new, changed or stale games")
+    parser.add_argument("--max_age", type=float, default=30, help="In incremental mode, fetch details again for games last updated more than this many days ago (default: 30)")
+    parser.add_argument("--parser", choices=['lxml', 'bs4'], default='lxml', help="Parser for search pages and API responses: 'lxml' (faster) or 'bs4' (BeautifulSoup) (default: lxml)")
+    parser.add_argument("-r", "--rate_limit", type=float, default=1.0, help="Maximum number of requests per second across all workers (default: 1.0)")
+    parser.add_argument("--min_batch_size", type=int, help="Smallest batch size the adaptive controller may shrink batches to (default: --batch_size)")
+    parser.add_argument("--max_batch_size", type=int, help="Largest batch size the adaptive controller may grow batches to (default: --batch_size)")
+    parser.add_argument("--controller_log", help="File to log the adaptive controller's rate, backoff and batch size decisions to")
+    parser.add_argument("--resume", action="store_true", help="Resume an interrupted run from its journal (<output>.journal), skipping the pages and batches it already completed")
+    parser.add_argument("--cache", nargs='?', const=DEFAULT_CACHE_FILE, help=f"Cache responses in the given SQLite file (default file when no path is given: {DEFAULT_CACHE_FILE})")
+    parser.add_argument("--cache_ttl", action='append', default=[], metavar="ENDPOINT=HOURS", help="How long cached responses stay fresh for an endpoint (search, collection or thing); can be repeated")
+    parser.add_argument("--cache_size", type=float, default=500, help="Maximum size of the response cache in MB; least recently used responses are evicted first (default: 500)")
+    parser.add_argument("--offline", action="store_true", help="Serve every request from the response cache and never contact BoardGameGeek")
+    parser.add_argument("--metrics_out", help="JSON file to write a report of the run's stage times, requests, retries, parse times and peak memory to")
+    parser.add_argument("--pool_size", type=int, help=f"Number of keep-alive connections to keep open (default: the most requests that can run at once, which is twice --concurrency with --pipeline, at least {DEFAULT_POOL_SIZE})")
+    parser.add_argument("--connect_timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT, help=f"Seconds to wait for a connection before retrying (default: {DEFAULT_CONNECT_TIMEOUT})")
+    parser.add_argument("--read_timeout", type=float, default=DEFAULT_READ_TIMEOUT, help=f"Seconds to wait for the server to send data before retrying (default: {DEFAULT_READ_TIMEOUT})")
+    parser.add_argument("--collection_timeout", type=float, default=DEFAULT_COLLECTION_QUEUE_TIMEOUT, help=f"Seconds to keep polling while BGG prepares a queued collection (default: {DEFAULT_COLLECTION_QUEUE_TIMEOUT})")
+    parser.add_argument("--base_url", default=DEFAULT_BASE_URL, help=f"Site to send the requests to, such as a local stand-in server for testing (default: {DEFAULT_BASE_URL})")
     
     return parser.parse_args()
 
-def create_session():
+class TokenBucket:
+    """
+    A thread-safe token bucket that caps the overall request rate.
+
+    Tokens are added to the bucket at a steady rate up to a fixed capacity. Each request
+    takes one token before it is sent, waiting for the bucket to refill when it is empty.
+    Sharing one bucket between all workers keeps the total request rate under the ceiling
+    no matter how many requests are running at once.
+
+    Args:
+        rate (float): Number of tokens added to the bucket per second.
+        capacity (float): Maximum number of tokens the bucket can hold, i.e. the largest burst allowed.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity  # Start full so the first request is sent immediately.
+        self.last_refill = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def pause(self, seconds):
+        """
+        Holds back every request for the given number of seconds, e.g. when the server asks the client to slow down.
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def acquire(self):
+        """
+        Takes one token from the bucket, blocking until one is available.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    # Nothing is sent while paused, and no tokens build up either.
+                    self.tokens = 0
+                    self.last_refill = self.paused_until
+                    wait_time = self.paused_until - now
+                else:
+                    # Refill the bucket based on the time elapsed since the last refill.
+                    self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                    self.last_refill = now
+
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+
+                    # Work out how long until a full token is available.
+                    wait_time = (1 - self.tokens) / self.rate
+
+            time.sleep(wait_time)
+
+    def set_rate(self, rate):
+        """
+        Changes the number of tokens added per second.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now >= self.paused_until:
+                # Bank the tokens earned at the old rate first.
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+            self.rate = rate
+
+def endpoint_name(url):
+    """
+    Returns the name of the BoardGameGeek endpoint a URL belongs to: 'search', 'collection', 'thing' or 'other'.
+    """
+    if "/xmlapi2/thing" in url:
+        return 'thing'
+    if "/xmlapi2/collection" in url:
+        return 'collection'
+    if "/search/" in url:
+        return 'search'
+    return 'other'
+
+def response_wire_size(response):
+    """
+    Returns the number of body bytes a response took on the wire, before any gzip, deflate or brotli decoding.
+
+    Args:
+        response (requests.Response): The response, with its body already read.
+
+    Returns:
+        int: The bytes read from the connection, or the Content-Length header if they were not counted,
+             or the decoded size if neither is known.
+    """
+    # urllib3 counts the raw bytes it reads from the connection.
+    bytes_read = getattr(response.raw, 'tell', lambda: None)()
+    if bytes_read:
+        return bytes_read
+
+    content_length = response.headers.get('Content-Length', '')
+    if content_length.isdigit():
+        return int(content_length)
+    return len(response.content)
+
+def parse_retry_after(response):
+    """
+    Reads the number of seconds to wait from a response's Retry-After header.
+
+    Args:
+        response (requests.Response): The response, or None.
+
+    Returns:
+        float: The seconds to wait, or None if the header is missing or invalid.
+    """
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    # The header can also be an HTTP date.
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class AdaptiveController:
+    """
+    Tunes the request rate, retry backoff and thing API batch size from how the server responds.
+
+    Every request made through a `BGGSession` is reported to its controller, whichever
+    function made it. The request rate follows an AIMD (additive increase, multiplicative
+    decrease) rule: each clean response raises the rate limiter's rate by a small step up
+    to the configured ceiling, while a 429, a 5xx or a failed connection halves it, at most
+    once per `decrease_interval` so that a burst of errors from requests already in flight
+    only counts once. Retries wait for the server's Retry-After when it is given, or for
+    an exponential backoff with jitter otherwise. The thing API batch size grows while
+    responses are clean and faster than `target_latency`, and shrinks on errors and slow
+    responses, between `min_batch_size` and `max_batch_size`.
+
+    Every change is logged through the module logger so the settings can be tuned.
+
+    Args:
+        rate_limiter (TokenBucket, optional): The session's rate limiter, whose rate is adjusted.
+        batch_size (int): The starting thing API batch size.
+        min_batch_size (int, optional): The smallest batch size allowed (default: batch_size).
+        max_batch_size (int, optional): The largest batch size allowed (default: batch_size).
+        target_latency (float): Thing responses slower than this many seconds shrink the batch size.
+        base_backoff (float): Seconds to wait before the first retry when the server gives no Retry-After.
+        max_backoff (float): The longest wait between retries.
+        decrease_interval (float): The minimum number of seconds between two rate decreases.
+    """
+
+    def __init__(self, rate_limiter=None, batch_size=100, min_batch_size=None, max_batch_size=None,
+                 target_latency=5.0, base_backoff=5.0, max_backoff=120.0, decrease_interval=2.0):
+        self.rate_limiter = rate_limiter
+        self.max_rate = rate_limiter.rate if rate_limiter else None
+        self.min_rate = self.max_rate / 10 if rate_limiter else None
+        self.rate_step = self.max_rate / 20 if rate_limiter else None
+
+        self.min_batch_size = min(min_batch_size or batch_size, batch_size)
+        self.max_batch_size = max(max_batch_size or batch_size, batch_size)
+        self.batch_size = batch_size
+        self.batch_step = max(1, (self.max_batch_size - self.min_batch_size) // 10)
+
+        self.target_latency = target_latency
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.decrease_interval = decrease_interval
+        self.last_decrease = 0
+        self.lock = threading.Lock()
+
+    def record(self, url, response, latency):
+        """
+        Reports the outcome of one request.
+
+        Args:
+            url (str): The requested URL.
+            response (requests.Response): The response, or None if the request failed without one.
+            latency (float): The time the request took, in seconds.
+        """
+        failed = response is None or response.status_code == 429 or response.status_code >= 500
+
+        with self.lock:
+            if self.rate_limiter is not None:
+                if failed:
+                    self._decrease_rate(response)
+                elif self.rate_limiter.rate < self.max_rate:
+                    self._set_rate(min(self.max_rate, self.rate_limiter.rate + self.rate_step), "clean response")
+
+            if endpoint_name(url) == 'thing':
+                self._adjust_batch_size(failed, latency)
+
+    def backoff(self, attempt, response=None):
+        """
+        Works out how long to wait before retrying a failed request.
+
+        A Retry-After header is honoured, and also holds back every other request through
+        the rate limiter for the same time. Otherwise the wait doubles with each attempt, up
+        to `max_backoff`, with random jitter so concurrent workers do not retry in lockstep.
+
+        Args:
+            attempt (int): How many times the request has failed so far.
+            response (requests.Response, optional): The failed response, if there was one.
+
+        Returns:
+            float: The number of seconds to wait.
+        """
+        retry_after = parse_retry_after(response)
+        if retry_after is not None:
+            wait_time = min(retry_after, self.max_backoff)
+            if self.rate_limiter is not None:
+                self.rate_limiter.pause(wait_time)
+            logger.info("Retry-After: waiting %.1fs before attempt %d", wait_time, attempt + 1)
+        else:
+            wait_time = min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1))
+            wait_time = random.uniform(wait_time / 2, wait_time)
+            logger.info("Backoff: waiting %.1fs before attempt %d", wait_time, attempt + 1)
+        return wait_time
+
+    def next_batch_size(self):
+        """
+        Returns the batch size to use for the next thing API request.
+        """
+        with self.lock:
+            return self.batch_size
+
+    def _decrease_rate(self, response):
+        now = time.monotonic()
+        if now - self.last_decrease < self.decrease_interval:
+            return
+        self.last_decrease = now
+        reason = f"HTTP {response.status_code}" if response is not None else "request error"
+        self._set_rate(max(self.min_rate, self.rate_limiter.rate / 2), reason)
+
+    def _set_rate(self, rate, reason):
+        if rate != self.rate_limiter.rate:
+            logger.info("Rate: %.2f -> %.2f requests/s (%s)", self.rate_limiter.rate, rate, reason)
+            self.rate_limiter.set_rate(rate)
+
+    def _adjust_batch_size(self, failed, latency):
+        if failed or latency > self.target_latency:
+            batch_size = max(self.min_batch_size, self.batch_size // 2 if failed else self.batch_size * 3 // 4)
+            reason = "error" if failed else f"slow response ({latency:.1f}s)"
+        elif latency < self.target_latency / 2:
+            batch_size = min(self.max_batch_size, self.batch_size + self.batch_step)
+            reason = f"fast response ({latency:.1f}s)"
+        else:
+            return
+
+        if batch_size != self.batch_size:
+            logger.info("Batch size: %d -> %d (%s)", self.batch_size, batch_size, reason)
+            self.batch_size = batch_size
+
+class CacheMissError(Exception):
+    """
+    Raised in offline mode when a requested URL is not in the response cache.
+    """
+
+class ResponseCache:
+    """
+    A persistent cache of successful GET responses, stored in a SQLite file and keyed by URL.
+
+    Each endpoint (search pages, collections and thing batches) has its own time-to-live,
+    after which a cached response is treated as a miss and fetched again. When the cache
+    grows past its size limit, the least recently used responses are evicted. In offline
+    mode every response is served from the cache, however old, and a miss raises
+    `CacheMissError` instead of contacting the server.
+
+    Args:
+        path (str): The SQLite file to store the cache in.
+        ttls (dict, optional): Hours each endpoint's responses stay fresh, overriding `DEFAULT_CACHE_TTLS`.
+        max_size (float): Maximum total size of the cached responses, in MB.
+        offline (bool): Whether to serve every request from the cache.
+    """
+
+    def __init__(self, path, ttls=None, max_size=500, offline=False):
+        self.ttls = {**DEFAULT_CACHE_TTLS, **(ttls or {})}
+        self.max_bytes = int(max_size * 1024 * 1024)
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        # The connection is shared by worker threads, so every use of it is guarded by the lock.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, content BLOB, headers TEXT, encoding TEXT, "
+            "stored_at REAL, accessed_at REAL, size INTEGER)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self.connection.commit()
+        self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url):
+        """
+        Looks up a URL in the cache.
+
+        Returns:
+            requests.Response: The cached response, or None if the URL is not cached or its entry has expired.
+
+        Raises:
+            CacheMissError: In offline mode, if the URL is not cached.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT content, headers, encoding, stored_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+
+            # Offline mode serves any cached entry, however old.
+            ttl = self.ttls.get(endpoint_name(url))
+            expired = row is not None and ttl is not None and time.time() - row[3] > ttl * 3600
+            if row is None or (expired and not self.offline):
+                self.misses += 1
+                if self.offline:
+                    raise CacheMissError(f"Not in cache: {url}")
+                return None
+
+            self.hits += 1
+            self.connection.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self.connection.commit()
+
+        content, headers, encoding, _ = row
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.url = url
+        response._content = content
+        response.headers.update(json.loads(headers))
+        response.encoding = encoding
+        return response
+
+    def put(self, url, response):
+        """
+        Stores a response in the cache, evicting the least recently used entries if the cache is full.
+        """
+        content = response.content
+        now = time.time()
+        with self.lock:
+            previous = self.connection.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            if previous:
+                self.total_bytes -= previous[0]
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, content, json.dumps(dict(response.headers)), response.encoding, now, now, len(content)),
+            )
+            self.total_bytes += len(content)
+
+            # Evict the least recently used entries until the cache fits its size limit again.
+            while self.total_bytes > self.max_bytes:
+                oldest = self.connection.execute(
+                    "SELECT url, size FROM responses ORDER BY accessed_at LIMIT 1"
+                ).fetchone()
+                if oldest is None:
+                    break
+                self.connection.execute("DELETE FROM responses WHERE url = ?", (oldest[0],))
+                self.total_bytes -= oldest[1]
+
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+class RunMetrics:
+    """
+    Records where the time of a run goes, for the JSON run report written with --metrics_out.
+
+    Every request made through a `BGGSession` is recorded by its metrics, with its endpoint,
+    latency, status and size. A request for a URL that was already requested counts as a retry,
+    unless the last response for it was a 202, in which case it counts as a poll of a queued collection.
+    Stage times and parse times are added by the functions that do the work. Stage times add up
+    over every time a stage is entered, and may overlap: rows streamed to the output as batches
+    arrive count towards both enrichment and writing.
+    """
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.requests = {}
+        self.parsing = {}
+        self.requested_urls = set()
+        self.queued_urls = set()
+        self.retries = 0
+        self.polls = 0
+        self.cache_hits = 0
+        self.lost_game_ids = []
+
+    def record_request(self, url, response, latency):
+        """
+        Records one request sent to the server.
+
+        Args:
+            url (str): The requested URL.
+            response (requests.Response): The response, or None if the request failed without one.
+            latency (float): The time the request took, in seconds.
+        """
+        with self.lock:
+            endpoint = self.requests.setdefault(endpoint_name(url), {
+                'requests': 0, 'bytes': 0, 'bytes_decoded': 0, 'errors': 0, 'statuses': {}, 'latencies': [],
+            })
+            endpoint['requests'] += 1
+            endpoint['latencies'].append(latency)
+            if response is None:
+                endpoint['errors'] += 1
+            else:
+                endpoint['bytes'] += response_wire_size(response)
+                endpoint['bytes_decoded'] += len(response.content)
+                status = str(response.status_code)
+                endpoint['statuses'][status] = endpoint['statuses'].get(status, 0) + 1
+
+            if url in self.queued_urls:
+                self.polls += 1
+            elif url in self.requested_urls:
+                self.retries += 1
+            self.requested_urls.add(url)
+            if response is not None and response.status_code == 202:
+                self.queued_urls.add(url)
+            else:
+                self.queued_urls.discard(url)
+
+    def record_lost_games(self, game_ids):
+        with self.lock:
+            self.lost_game_ids.extend(game_ids)
+
+    def record_cache_hit(self):
+        with self.lock:
+            self.cache_hits += 1
+
+    def record_parse(self, endpoint, seconds, items):
+        """
+        Records the time taken to parse one response.
+
+        Args:
+            endpoint (str): The endpoint the response came from.
+            seconds (float): The time taken to parse it.
+            items (int): The number of games in it.
+        """
+        with self.lock:
+            parsing = self.parsing.setdefault(endpoint, {'responses': 0, 'items': 0, 'seconds': 0.0, 'batch_seconds': []})
+            parsing['responses'] += 1
+            parsing['items'] += items
+            parsing['seconds'] += seconds
+            parsing['batch_seconds'].append(round(seconds, 6))
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times a stage of the run, adding to any earlier time spent in the same stage.
+
+        Args:
+            name (str): The stage, such as 'discovery', 'collection', 'enrichment' or 'writing'.
+        """
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + time.monotonic() - start_time
+
+    def report(self, **summary):
+        """
+        Builds the run report.
+
+        Args:
+            **summary: Further values to include at the top level of the report, such as the run's options.
+
+        Returns:
+            dict: The report, ready to be written as JSON.
+        """
+        with self.lock:
+            requests_by_endpoint = {}
+            for name, endpoint in self.requests.items():
+                latencies = sorted(endpoint['latencies'])
+                histogram = {f"<={bound}s": 0 for bound in LATENCY_BUCKETS}
+                histogram[f">{LATENCY_BUCKETS[-1]}s"] = 0
+                for latency in latencies:
+                    bucket = next((f"<={bound}s" for bound in LATENCY_BUCKETS if latency <= bound), f">{LATENCY_BUCKETS[-1]}s")
+                    histogram[bucket] += 1
+                requests_by_endpoint[name] = {
+                    'requests': endpoint['requests'],
+                    'bytes': endpoint['bytes'],
+                    'bytes_decoded': endpoint['bytes_decoded'],
+                    'errors': endpoint['errors'],
+                    'statuses': endpoint['statuses'],
+                    'latency': {
+                        'mean': sum(latencies) / len(latencies),
+                        'p50': latencies[len(latencies) // 2],
+                        'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                        'max': latencies[-1],
+                        'histogram': histogram,
+                    },
+                }
+
+            # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+            peak_rss_mb = None
+            if resource is not None:
+                peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                peak_rss_mb = peak_rss / 2 ** 20 if sys.platform == 'darwin' else peak_rss / 2 ** 10
+
+            return {
+                'started': time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.start_time)),
+                'wall_time': time.time() - self.start_time,
+                **summary,
+                'stages': dict(self.stages),
+                'requests': sum(endpoint['requests'] for endpoint in self.requests.values()),
+                'bytes_downloaded': sum(endpoint['bytes'] for endpoint in self.requests.values()),
+                'bytes_decoded': sum(endpoint['bytes_decoded'] for endpoint in self.requests.values()),
+                'retries': self.retries,
+                'collection_polls': self.polls,
+                'rate_limited': sum(endpoint['statuses'].get('429', 0) for endpoint in self.requests.values()),
+                'cache_hits': self.cache_hits,
+                'lost_game_ids': list(self.lost_game_ids),
+                'endpoints': requests_by_endpoint,
+                'parsing': {name: dict(parsing) for name, parsing in self.parsing.items()},
+                'peak_rss_mb': peak_rss_mb,
+            }
+
+class BGGSession(requests.Session):
+    """
+    A requests session that passes every request through a shared rate limiter, an adaptive
+    controller and an optional response cache.
+
+    Cached GET responses are returned without touching the rate limiter, the controller or the network.
+
+    Args:
+        rate_limiter (TokenBucket, optional): The limiter to take a token from before each request.
+        cache (ResponseCache, optional): The cache to serve GET requests from and store successful responses in.
+        controller (AdaptiveController, optional): The controller every request's outcome is reported to.
+        base_url (str): The site the request URLs are built from.
+        metrics (RunMetrics, optional): Records every request for the run report.
+        timeout (tuple): The connect and read timeouts, in seconds, of requests that do not set their own.
+    """
+
+    def __init__(self, rate_limiter=None, cache=None, controller=None, base_url=DEFAULT_BASE_URL, metrics=None,
+                 timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)):
+        super().__init__()
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.controller = controller or AdaptiveController(rate_limiter)
+        self.base_url = base_url.rstrip('/')
+        self.metrics = metrics or RunMetrics()
+        self.timeout = timeout
+
+    def request(self, method, url, *args, **kwargs):
+        use_cache = self.cache is not None and method.upper() == 'GET'
+        if use_cache:
+            cached_response = self.cache.get(url)
+            if cached_response is not None:
+                self.metrics.record_cache_hit()
+                return cached_response
+
+        # Wait for the shared limiter before sending the request.
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+        kwargs.setdefault('timeout', self.timeout)
+
+        # Report how the request went to the controller.
+        start_time = time.monotonic()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException:
+            self.controller.record(url, None, time.monotonic() - start_time)
+            self.metrics.record_request(url, None, time.monotonic() - start_time)
+            raise
+        self.controller.record(url, response, time.monotonic() - start_time)
+        self.metrics.record_request(url, response, time.monotonic() - start_time)
+
+        # Only successful responses are cached; queued (202) and error responses are always fetched again.
+        if use_cache and response.status_code == 200:
+            self.cache.put(url, response)
+        return response
+
+def create_session(rate_limit=None, cache=None, batch_size=100, min_batch_size=None, max_batch_size=None, base_url=DEFAULT_BASE_URL,
+                   pool_size=DEFAULT_POOL_SIZE, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
     
     """
     Creates a session with a random user agent.
@@ -38,185 +745,509 @@ def create_session():
     simulating a random browser user agent. This can help in preventing
     the web server from blocking the requests due to scraping activities.
 
+    Args:
+        rate_limit (float, optional): Maximum number of requests per second made through the session.
+                                      No limit is applied if not provided.
+        cache (ResponseCache, optional): A response cache to serve GET requests from.
+        batch_size (int): The starting thing API batch size for the session's adaptive controller.
+        min_batch_size (int, optional): The smallest batch size the controller may use.
+        max_batch_size (int, optional): The largest batch size the controller may use.
+        base_url (str): The site to send the requests to.
+        pool_size (int): The number of keep-alive connections to keep open to the site. This should be at least
+                         the number of requests run at once, or connections are closed and opened again.
+        connect_timeout (float): Seconds to wait for a connection to the site.
+        read_timeout (float): Seconds to wait for the site to send data.
+
     Returns:
-        session (requests.Session): A session object configured with a random user agent.
+        session (BGGSession): A session object configured with a random user agent.
     """
     
     # Initialize UserAgent with a list of browser types to simulate.
     ua = UserAgent(browsers=['chrome', 'edge', 'firefox', 'safari'])
-    # Create a dictionary with the 'User-Agent' header using a random user agent string.
-    headers = {'User-Agent': ua.random}
+    # Create a dictionary with the 'User-Agent' header using a random user agent string,
+    # and ask for compressed responses.
+    headers = {'User-Agent': ua.random, 'Accept-Encoding': ACCEPT_ENCODING}
+
+    # Create a rate limiter shared by every request made through the session,
+    # and a controller that tunes it from the responses.
+    rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+    controller = AdaptiveController(rate_limiter, batch_size=batch_size, min_batch_size=min_batch_size, max_batch_size=max_batch_size)
 
     # Create a session object from the requests library.
-    session = requests.Session()
+    session = BGGSession(rate_limiter, cache, controller, base_url, timeout=(connect_timeout, read_timeout))
     # Update the session's headers with the created 'headers' dictionary.
     session.headers.update(headers)
 
+    # Keep enough connections open for every request running at once to reuse one.
+    # Retries are left to get_with_retries and the controller rather than the adapter.
+    adapter = HTTPAdapter(pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
     # Return the configured session object.
     return session
 
-def fetch_games(session, username, page_number):
+def get_with_retries(session, url, max_retries=5):
     """
-    Fetches game data from BoardGameGeek based on a specified username and page number.
+    Makes a GET request, retrying on HTTP errors and connection problems.
+
+    The wait before each retry comes from the session's adaptive controller, which honours
+    the server's Retry-After header and otherwise backs off exponentially with jitter.
 
     Args:
-        session (requests.Session): The session object used for making HTTP requests.
-        username (str): The BoardGameGeek username whose game list is to be fetched.
-        page_number (int): The page number for pagination purposes.
+        session (BGGSession): The session object used for making HTTP requests.
+        url (str): The URL to request.
+        max_retries (int): The maximum number of attempts.
 
     Returns:
-        dict: A dictionary containing game IDs as keys and dictionaries with game details as values.
+        requests.Response: The successful response, or the last response received if every attempt failed,
+                           or None if no response was received at all.
     """
-    url = f"https://boardgamegeek.com/search/boardgame/page/{page_number}?sort=avgrating&advsearch=1&q=&include%5Bdesignerid%5D=&include%5Bpublisherid%5D=&geekitemname=&range%5Byearpublished%5D%5Bmin%5D=&range%5Byearpublished%5D%5Bmax%5D=&range%5Bminage%5D%5Bmax%5D=&range%5Bnumvoters%5D%5Bmin%5D=50&range%5Bnumweights%5D%5Bmin%5D=&range%5Bminplayers%5D%5Bmax%5D=&range%5Bmaxplayers%5D%5Bmin%5D=&range%5Bleastplaytime%5D%5Bmin%5D=&range%5Bplaytime%5D%5Bmax%5D=&floatrange%5Bavgrating%5D%5Bmin%5D=&floatrange%5Bavgrating%5D%5Bmax%5D=&floatrange%5Bavgweight%5D%5Bmin%5D=&floatrange%5Bavgweight%5D%5Bmax%5D=&colfiltertype=&searchuser=&playerrangetype=normal&B1=Submit&sortdir=desc"
-    
-    retries = 0
-    max_retries = 5
-
-    while retries < max_retries:
+    response = None
+    for attempt in range(1, max_retries + 1):
         try:
             response = session.get(url)
             response.raise_for_status()  # Raise an exception for HTTP errors
-            break
-        except requests.exceptions.HTTPError as e:
+            return response
+        except requests.exceptions.HTTPError:
+            wait_time = session.controller.backoff(attempt, response)
             if response.status_code == 429:  # Too many requests
-                retries += 1
-                wait_time = 10 * retries
-                print(f"Rate limit hit. Retrying in {wait_time} seconds... ({retries})")
-                time.sleep(wait_time)  # Exponential backoff
+                print(f"Rate limit hit. Retrying in {wait_time:.1f} seconds... ({attempt})")
             else:
-                retries += 1
-                print(f"Error {response.status_code}. Retrying... ({retries})")
-                time.sleep(5)
+                print(f"Error {response.status_code}. Retrying in {wait_time:.1f} seconds... ({attempt})")
         except requests.exceptions.ChunkedEncodingError:
-            retries += 1
-            print(f"ChunkedEncodingError encountered. Retrying... ({retries})")
-            time.sleep(5)
+            wait_time = session.controller.backoff(attempt)
+            print(f"ChunkedEncodingError encountered. Retrying in {wait_time:.1f} seconds... ({attempt})")
         except requests.exceptions.RequestException as e:
-            retries += 1
-            print(f"RequestException encountered: {e}. Retrying... ({retries})")
-            time.sleep(5)
+            response = None
+            wait_time = session.controller.backoff(attempt)
+            print(f"RequestException encountered: {e}. Retrying in {wait_time:.1f} seconds... ({attempt})")
+
+        if attempt < max_retries:
+            time.sleep(wait_time)
+
+    return response
+
+def ordered_map(func, items, concurrency=1):
+    """
+    Applies a function to each item, running up to `concurrency` calls at once.
+
+    Results are yielded in the same order as the items, regardless of the order the
+    calls finish in, so the output matches a plain serial loop. Items are pulled from
+    the iterable only when a worker is free, and stopping the iteration early cancels
+    any calls that have not started yet.
+
+    Args:
+        func (callable): The function to call with each item.
+        items (iterable): The items to process.
+        concurrency (int): The maximum number of calls to run at once. 1 runs every call in the current thread.
+
+    Yields:
+        The result of `func` for each item, in order.
+    """
+    # Serial mode: no threads at all.
+    if concurrency <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Fill the pool, then submit a new call each time the oldest one is collected.
+        pending = deque(executor.submit(func, item) for item in islice(items, concurrency))
+        try:
+            while pending:
+                result = pending.popleft().result()
+                for item in islice(items, 1):
+                    pending.append(executor.submit(func, item))
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+def fetch_games(session, username, page_number, parser='lxml'):
+    """
+    Fetches game data from BoardGameGeek based on a specified username and page number.
+
+    Args:
+        session (BGGSession): The session object used for making HTTP requests.
+        username (str): The BoardGameGeek username whose game list is to be fetched.
+        page_number (int): The page number for pagination purposes.
+        parser (str): The parser for the page: 'lxml' (fast) or 'bs4' (BeautifulSoup).
+
+    Returns:
+        dict: A dictionary containing game IDs as keys and dictionaries with game details as values.
+    """
+    url = f"{session.base_url}/search/boardgame/page/{page_number}?sort=avgrating&advsearch=1&q=&include%5Bdesignerid%5D=&include%5Bpublisherid%5D=&geekitemname=&range%5Byearpublished%5D%5Bmin%5D=&range%5Byearpublished%5D%5Bmax%5D=&range%5Bminage%5D%5Bmax%5D=&range%5Bnumvoters%5D%5Bmin%5D=50&range%5Bnumweights%5D%5Bmin%5D=&range%5Bminplayers%5D%5Bmax%5D=&range%5Bmaxplayers%5D%5Bmin%5D=&range%5Bleastplaytime%5D%5Bmin%5D=&range%5Bplaytime%5D%5Bmax%5D=&floatrange%5Bavgrating%5D%5Bmin%5D=&floatrange%5Bavgrating%5D%5Bmax%5D=&floatrange%5Bavgweight%5D%5Bmin%5D=&floatrange%5Bavgweight%5D%5Bmax%5D=&colfiltertype=&searchuser=&playerrangetype=normal&B1=Submit&sortdir=desc"
     
-    if response.status_code != 200:
+    max_retries = 5
+    response = get_with_retries(session, url, max_retries)
+
+    if response is None or response.status_code != 200:
         print(f"Failed to fetch page {page_number} after {max_retries} retries. Skipping.")
         return {}
 
-    soup = BeautifulSoup(response.text, 'html.parser')
-    table = soup.find('table', {'class': 'collection_table'})
+    parse_start = time.perf_counter()
+    games = parse_search_page(response.text, parser)
+    session.metrics.record_parse('search', time.perf_counter() - parse_start, len(games or ()))
 
-    if table is None:
+    if games is None:
         print(f"No collection table found on page {page_number}")
         return {}
 
+    # No fixed delay here: pacing between requests is handled by the session's rate limiter.
+    return games
+
+def search_row_details(game_title, href, avg_rating, num_voters):
+    """
+    Builds the game details for one row of a search results page.
+
+    Args:
+        game_title (str): The game's title.
+        href (str): The link to the game's page, which holds its ID and type.
+        avg_rating (str): The text of the average rating cell.
+        num_voters (str): The text of the number of voters cell.
+
+    Returns:
+        dict: The game's details.
+    """
+    game_id = re.search(r'/boardgame(?:expansion)?/(\d+)', href).group(1)
+
+    if "boardgameexpansion" in href:
+        game_type = "Expansion"
+    else:
+        game_type = "Base Game"
+
+    return {
+        'Game Title': game_title,
+        'Type': game_type,
+        'Game ID': game_id,
+        'Average Rating': float(avg_rating),
+        'Number of Voters': int(num_voters),
+        'Weight': None,
+        'Weight Votes': None,
+        'Owned': 'Not Owned'
+    }
+
+def parse_search_page_bs4(html):
+    """
+    Extracts the games from a search results page with BeautifulSoup.
+
+    This is kept as a fallback for `parse_search_page_lxml`.
+
+    Args:
+        html (str): The text of the search results page.
+
+    Returns:
+        dict: Game IDs as keys and game details as values, or None if the page has no collection table.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    table = soup.find('table', {'class': 'collection_table'})
+
+    if table is None:
+        return None
+
     games = {}
 
     for row in table.find_all('tr', {'id': re.compile(r'^row_')}):
-        game_title_element = row.find_all('td')[2]
-        game_title = game_title_element.a.text.strip()
-        game_id = re.search(r'/boardgame(?:expansion)?/(\d+)', game_title_element.a['href']).group(1)
+        cells = row.find_all('td')
+        game_title_element = cells[2]
+        game = search_row_details(game_title_element.a.text.strip(), game_title_element.a['href'],
+                                  cells[4].text.strip(), cells[5].text.strip())
+        games[game['Game ID']] = game
 
-        if "boardgameexpansion" in game_title_element.a['href']:
-            game_type = "Expansion"
-        else:
-            game_type = "Base Game"
-
-        avg_rating = float(row.find_all('td')[4].text.strip())
-        num_voters = int(row.find_all('td')[5].text.strip())
-
-        weight = None
-        weight_votes = None
-        owned = 'Not Owned'
-
-        games[game_id] = {
-            'Game Title': game_title,
-            'Type': game_type,
-            'Game ID': game_id,
-            'Average Rating': avg_rating,
-            'Number of Voters': num_voters,
-            'Weight': weight,
-            'Weight Votes': weight_votes,
-            'Owned': owned
-        }
-        
-    time.sleep(1)  # Add a 1-second delay between requests
     return games
 
-def fetch_games_owned_api(session, username):
+def parse_search_page_lxml(html):
     """
-    Fetches owned game data for a specified username from the BoardGameGeek API.
+    Extracts the games from a search results page with lxml.
+
+    The page is parsed by lxml's C HTML parser and the rows of the collection table are
+    picked out with XPath, reading each row's cells once. The results are the same as
+    `parse_search_page_bs4`.
+
+    Args:
+        html (str): The text of the search results page.
+
+    Returns:
+        dict: Game IDs as keys and game details as values, or None if the page has no collection table.
+    """
+    document = lxml.html.fromstring(html)
+    tables = document.xpath("//table[contains(concat(' ', normalize-space(@class), ' '), ' collection_table ')]")
+
+    if not tables:
+        return None
+
+    games = {}
+
+    for row in tables[0].xpath(".//tr[starts-with(@id, 'row_')]"):
+        cells = row.xpath(".//td")
+        link = cells[2].xpath(".//a")[0]
+        game = search_row_details(link.text_content().strip(), link.get('href'),
+                                  cells[4].text_content().strip(), cells[5].text_content().strip())
+        games[game['Game ID']] = game
+
+    return games
+
+def parse_search_page(html, parser='lxml'):
+    """
+    Extracts the games from a search results page with the chosen parser.
+
+    Args:
+        html (str): The text of the search results page.
+        parser (str): 'lxml' for the fast XPath extractor, or 'bs4' for the BeautifulSoup fallback.
+
+    Returns:
+        dict: Game IDs as keys and game details as values, or None if the page has no collection table.
+    """
+    if parser == 'bs4':
+        return parse_search_page_bs4(html)
+    return parse_search_page_lxml(html)
 
-    This function makes a request to the BoardGameGeek XML API to retrieve information
-    about games owned by a specific user, including base games and expansions. It parses
-    the XML response to extract game details such as the title, ID, average rating, and
-    number of voters for each game in the user's collection.
+def fetch_search_pages(session, username, games_to_fetch, concurrency=1, progress_bar=None, on_new_game=None, parser='lxml', journal=None):
+    """
+    Fetches search result pages until the requested number of games has been collected.
+
+    Pages are requested through `fetch_games`, up to `concurrency` at a time, and their
+    games are added in page order so the result is the same as fetching the pages one by one.
 
     Args:
         session (requests.Session): The session object used for making HTTP requests.
+        username (str): The BoardGameGeek username, passed on to `fetch_games`.
+        games_to_fetch (int): The number of games to collect.
+        concurrency (int): The maximum number of pages to request at once.
+        progress_bar (tqdm.tqdm, optional): Optional tqdm progress bar instance for visual progress tracking.
+        on_new_game (callable, optional): Called with each game's details the first time the game is found.
+        parser (str): The parser for the pages: 'lxml' or 'bs4'.
+        journal (RunJournal, optional): Journal that pages are taken from if they were fetched before an
+                                        interruption, and that newly fetched pages are recorded in.
+
+    Returns:
+        dict: A dictionary containing game IDs as keys and dictionaries with game details as values.
+    """
+    games = {}
+    fetched_games = 0
+    current_page = 1
+
+    def fetch_page(page_number):
+        if journal and page_number in journal.pages:
+            return journal.pages[page_number]
+        page_games = fetch_games(session, username, page_number, parser=parser)
+        # Failed pages are not recorded, so a resumed run tries them again.
+        if journal and page_games:
+            journal.record_page(page_number, page_games)
+        return page_games
+
+    while fetched_games < games_to_fetch:
+        # Request only as many pages as are needed to reach the target, assuming full pages.
+        pages_needed = math.ceil((games_to_fetch - fetched_games) / SEARCH_PAGE_SIZE)
+        pages = range(current_page, current_page + pages_needed)
+
+        try:
+            for page_games in ordered_map(fetch_page, pages, concurrency):
+                for game in page_games.values():
+                    if fetched_games >= games_to_fetch:
+                        break
+                    fetched_games += 1
+                    if on_new_game and game["Game ID"] not in games:
+                        on_new_game(game)
+                    games[game["Game ID"]] = game
+                    if progress_bar:
+                        progress_bar.update(1)
+        except CacheMissError as e:
+            # In offline mode, stop at the first page that was never cached.
+            print(f"{e}. Stopping the search after {fetched_games} games.")
+            break
+
+        # Any page that came back short is made up for in the next round.
+        current_page += pages_needed
+
+    return games
+
+def collection_game_details(game_id, game_title, game_type, avg_rating, num_voters):
+    """
+    Builds the details of one owned game from a collection response.
+
+    Args:
+        game_id (str): The game's ID.
+        game_title (str): The game's title.
+        game_type (str): 'Base Game' or 'Expansion'.
+        avg_rating (str): The game's average rating.
+        num_voters (str): The game's number of voters.
+
+    Returns:
+        dict: The game's details, marked as owned.
+    """
+    return {
+        'Game Title': game_title,
+        'Type': game_type,
+        'Game ID': game_id,
+        'Average Rating': float(avg_rating),
+        'Number of Voters': int(num_voters),
+        'Weight': None,  # Placeholder for game weight; may be updated later.
+        'Weight Votes': None,  # Placeholder for weight votes; may be updated later.
+        'Owned': 'Owned'  # Mark the game as owned.
+    }
+
+def parse_collection_response_bs4(content, game_type):
+    """
+    Parses an XML API collection response with BeautifulSoup.
+
+    This builds a full tree for the response and is kept as a fallback for `parse_collection_response_lxml`.
+
+    Args:
+        content (bytes): The body of the collection response.
+        game_type (str): The type of the games in the response: 'Base Game' or 'Expansion'.
+
+    Returns:
+        dict: Game IDs as keys and game details as values.
+    """
+    soup = BeautifulSoup(content, 'lxml-xml')
+
+    games_owned = {}
+    for item in soup.find_all("item"):
+        game_id = item["objectid"]
+        games_owned[game_id] = collection_game_details(game_id, item.find('name').text, game_type,
+                                                       item.stats.find('average')['value'], item.stats.find('usersrated')['value'])
+    return games_owned
+
+def parse_collection_response_lxml(content, game_type):
+    """
+    Parses an XML API collection response in a single streaming pass with lxml.
+
+    Each item is handled as soon as its closing tag is read and then cleared, so memory use
+    stays flat however large the collection is. The results are the same as
+    `parse_collection_response_bs4`.
+
+    Args:
+        content (bytes): The body of the collection response.
+        game_type (str): The type of the games in the response: 'Base Game' or 'Expansion'.
+
+    Returns:
+        dict: Game IDs as keys and game details as values.
+    """
+    games_owned = {}
+    for _, item in etree.iterparse(io.BytesIO(content), events=("end",), tag="item", recover=True, huge_tree=True):
+        game_id = item.get("objectid")
+        rating = item.find("stats/rating")
+        games_owned[game_id] = collection_game_details(game_id, item.findtext("name", default=""), game_type,
+                                                       rating.find("average").get("value"), rating.find("usersrated").get("value"))
+
+        # Free the finished item and any earlier siblings still held by the root.
+        item.clear()
+        while item.getprevious() is not None:
+            del item.getparent()[0]
+    return games_owned
+
+def parse_collection_response(content, game_type, parser='lxml'):
+    """
+    Parses an XML API collection response with the chosen parser.
+
+    Args:
+        content (bytes): The body of the collection response.
+        game_type (str): The type of the games in the response: 'Base Game' or 'Expansion'.
+        parser (str): 'lxml' for the streaming parser, or 'bs4' for the BeautifulSoup fallback.
+
+    Returns:
+        dict: Game IDs as keys and game details as values.
+    """
+    if parser == 'bs4':
+        return parse_collection_response_bs4(content, game_type)
+    return parse_collection_response_lxml(content, game_type)
+
+def fetch_collection(session, url, max_retries=10, queue_timeout=DEFAULT_COLLECTION_QUEUE_TIMEOUT):
+    """
+    Requests a collection from the XML API, waiting while BoardGameGeek prepares it.
+
+    BoardGameGeek answers 202 while a collection is queued for preparation. Those replies are
+    polled again after a wait that starts short and grows with each poll, for up to
+    `queue_timeout` seconds in all. Errors and connection problems are retried separately, after
+    the session controller's backoff, up to `max_retries` times.
+
+    Args:
+        session (BGGSession): The session object used for making HTTP requests.
+        url (str): The collection URL.
+        max_retries (int): The maximum number of attempts after errors.
+        queue_timeout (float): The longest time, in seconds, to wait for a queued collection.
+
+    Returns:
+        requests.Response: The successful response.
+    """
+    retries = 0
+    polls = 0
+    queued_since = None
+
+    while True:
+        try:
+            response = session.get(url)  # Make the API request.
+        except requests.exceptions.RequestException as e:
+            # Connection problems and cut-off responses are retried like error responses.
+            response = None
+            error = f"RequestException encountered: {e}"
+        else:
+            if response.status_code == 200:
+                return response
+            error = f"Response from API Status Code {response.status_code}"
+
+        if response is not None and response.status_code == 202:
+            # The collection is queued: poll again, waiting a little longer each time.
+            polls += 1
+            queued_since = queued_since or time.monotonic()
+            remaining = queue_timeout - (time.monotonic() - queued_since)
+            if remaining <= 0:
+                raise Exception(f"Collection still queued after {queue_timeout:.0f} seconds. Stopping.")
+            wait_time = min(remaining, COLLECTION_POLL_MAX_WAIT, COLLECTION_POLL_FIRST_WAIT * 1.5 ** (polls - 1))
+            print(f"Collection queued by BGG. Checking again in {wait_time:.1f} seconds... ({polls})")
+        else:
+            retries += 1
+            if retries >= max_retries:
+                raise Exception(f"{max_retries} retries reached. Stopping.")
+            wait_time = session.controller.backoff(retries, response)
+            print(f"{error}. Retrying in {wait_time:.1f} seconds... ({retries})")
+
+        time.sleep(wait_time)
+
+def fetch_games_owned_api(session, username, parser='lxml', queue_timeout=DEFAULT_COLLECTION_QUEUE_TIMEOUT):
+    """
+    Fetches owned game data for a specified username from the BoardGameGeek API.
+
+    This function makes requests to the BoardGameGeek XML API to retrieve information
+    about games owned by a specific user, including base games and expansions. The base game
+    and expansion collections are requested at the same time, and each is parsed to extract
+    game details such as the title, ID, average rating, and number of voters.
+
+    Args:
+        session (BGGSession): The session object used for making HTTP requests.
         username (str): The BoardGameGeek username whose owned games are to be fetched.
+        parser (str): The parser for the XML responses: 'lxml' (streaming) or 'bs4' (BeautifulSoup).
+        queue_timeout (float): The longest time, in seconds, to wait for each collection while BoardGameGeek prepares it.
 
     Returns:
         dict: A dictionary with game IDs as keys and dictionaries containing game details as values.
     """
-    # Initialize an empty dictionary to store details of games owned by the user.
-    games_owned = {}        
-    # Set the ownership status for all games fetched through this function.
-    owned = 'Owned'
-    
     # Base URL for the BoardGameGeek XML API request, specifying owned games with stats for the given username.
-    base_url = f"https://boardgamegeek.com/xmlapi2/collection?username={username}&own=1&stats=1&subtype="
-    # Specify the types of games to fetch: base games and expansions.
-    types = ["boardgame", "boardgameexpansion"]
-    
-    # Loop through both game types to fetch.
-    for type in types:
-        # Construct the final URL with the specific game type.
-        url = base_url + type
-        retries = 0  # Initialize retries counter for handling request failures.
-
-        # Initialize the game_type variable depending on what the API is fetching.
-        if type == "boardgame":
-            game_type = "Base Game"
-        else:
-            game_type = "Expansion"
+    base_url = f"{session.base_url}/xmlapi2/collection?username={username}&own=1&stats=1&subtype="
+    # The types of games to fetch, base games and expansions, and the type each is recorded as.
+    types = {"boardgame": "Base Game", "boardgameexpansion": "Expansion"}
+
+    def fetch_type(type):
+        try:
+            response = fetch_collection(session, base_url + type, queue_timeout=queue_timeout)
+        except CacheMissError as e:
+            # In offline mode, skip a collection that was never cached.
+            print(f"{e}. Skipping the {type} collection.")
+            return {}
+
+        parse_start = time.perf_counter()
+        type_games_owned = parse_collection_response(response.content, types[type], parser)
+        session.metrics.record_parse('collection', time.perf_counter() - parse_start, len(type_games_owned))
+        return type_games_owned
+
+    # Fetch both types at once, then combine them with the base games first.
+    games_owned = {}
+    for type_games_owned in ordered_map(fetch_type, types, concurrency=len(types)):
+        games_owned.update(type_games_owned)
 
-        # Retry loop in case of unsuccessful API responses.
-        while True:
-            response = session.get(url)  # Make the API request.
-            time.sleep(1.5)  # Sleep to respect rate limiting.
-
-            # Check if the API response is successful (HTTP status code 200).
-            if response.status_code != 200:
-                retries += 1  # Increment the retries counter.
-                print(f"Response from API Status Code {response.status_code}. Retrying... ({retries})")
-                if retries >= 50:  # Give up after 50 retries.
-                    raise Exception("50 retries reached. Stopping.")
-                time.sleep(5)  # Wait a bit longer before retrying.
-                continue  # Retry the request.
-
-            break  # Exit the retry loop on success.
-
-        # Parse the XML response.
-        soup = BeautifulSoup(response.text, 'lxml-xml')
-        items = soup.find_all("item")  # Find all game items in the response.
-        
-        # Loop through each game item to extract details.
-        for item in items:
-            game_id = item["objectid"]
-            game_title = item.find('name').text
-            avg_rating = float(item.stats.find('average')['value'])
-            num_voters = int(item.stats.find('usersrated')['value'])            
-            
-            # Add the game details to the dictionary.
-            games_owned[game_id] = {
-                'Game Title': game_title,
-                'Type': game_type,
-                'Game ID': game_id,
-                'Average Rating': avg_rating,
-                'Number of Voters': num_voters,
-                'Weight': None,  # Placeholder for game weight; may be updated later.
-                'Weight Votes': None,  # Placeholder for weight votes; may be updated later.
-                'Owned': owned  # Mark the game as owned.
-            }
-        
     return games_owned  # Return the dictionary of owned games.
   
 def merge_games_and_update_owned(games, games_owned):
@@ -249,37 +1280,33 @@ def merge_games_and_update_owned(games, games_owned):
     # Return the updated games dictionary with merged ownership information.
     return games
 
-def write_merged_data_to_csv(games, player_count_data_dict, csv_filename):
+def merged_csv_rows(games, player_count_data_dict):
     """
-    Writes the merged game and player count data to a CSV file.
-
-    This function takes the merged data from the games dictionary and the player count data dictionary,
-    then writes it into a CSV file with detailed information for each game. This includes game title,
-    ID, year, average rating, number of voters, weight, weight votes, ownership status, type, player count,
-    and various voting percentages and counts related to player count recommendations.
+    Yields one CSV row for each game and player count, merging the game details with the player count data.
 
     Args:
         games (dict): A dictionary containing game details.
         player_count_data_dict (dict): A dictionary containing player count recommendation data for each game.
-        csv_filename (str): The filename of the CSV file to write the data to.
-    """
-    merged_data = []  # Initialize a list to hold the merged data for CSV writing.
 
+    Yields:
+        dict: The row for one game and player count.
+    """
     # Iterate through the player count data dictionary to merge it with the games dictionary.
     for game_id, player_count_data in player_count_data_dict.items():
         if game_id in games:
+            game = games[game_id]
             for player_count, player_data in player_count_data.items():
-                row = {
-                    'Game Title': games[game_id]['Game Title'],
+                yield {
+                    'Game Title': game['Game Title'],
                     'Game ID': game_id,
-                    'Year': games[game_id].get('Year', 'N/A'),  # Use 'N/A' if 'Year' is not available.
-                    'BGG Rank': games[game_id].get('BGG Rank'),  # Use 'N/A' if 'BGG Rank' is not available.
-                    'Average Rating': games[game_id]['Average Rating'],
-                    'Number of Voters': games[game_id]['Number of Voters'],
-                    'Weight': games[game_id].get('Weight', 'N/A'),  # Use 'N/A' if 'Weight' is not available.
-                    'Weight Votes': games[game_id].get('Weight Votes', 'N/A'),  # Use 'N/A' if 'Weight Votes' is not available.
-                    'Owned': games[game_id]['Owned'],
-                    'Type': games[game_id]['Type'],
+                    'Year': game.get('Year', 'N/A'),  # Use 'N/A' if 'Year' is not available.
+                    'BGG Rank': game.get('BGG Rank'),  # Use 'N/A' if 'BGG Rank' is not available.
+                    'Average Rating': game['Average Rating'],
+                    'Number of Voters': game['Number of Voters'],
+                    'Weight': game.get('Weight', 'N/A'),  # Use 'N/A' if 'Weight' is not available.
+                    'Weight Votes': game.get('Weight Votes', 'N/A'),  # Use 'N/A' if 'Weight Votes' is not available.
+                    'Owned': game['Owned'],
+                    'Type': game['Type'],
                     'Player Count': player_count,
                     'Best %': player_data['Best %'],
                     'Best Votes': player_data['Best Votes'],
@@ -289,80 +1316,515 @@ def write_merged_data_to_csv(games, player_count_data_dict, csv_filename):
                     'Not Recommended Votes': player_data['Not Recommended Votes'],
                     'Vote Count': player_data['Vote Count']
                 }
-                merged_data.append(row)  # Add the row to the merged_data list.
-
-    # Write the merged data to a CSV file.
-    with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-        if merged_data:  # Ensure there is data to write.
-            fieldnames = list(merged_data[0].keys())  # Extract the field names from the first row.
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()  # Write the header row.
-            for row in merged_data:
-                writer.writerow(row)  # Write each row of data.
 
-def write_merged_data_to_json(games, player_count_data_dict, json_filename):
+class CSVStreamWriter:
     """
-    Writes game data and player count recommendations to a JSON file.
+    Writes the merged game and player count data to a CSV file a batch at a time.
 
-    This function creates a JSON file where each game is represented once with its details,
-    and player count recommendations are nested within each game entry. This structure minimizes
-    duplication of game details across different player counts.
+    The file is opened once and rows are appended as each batch of games is enriched,
+    so only one batch of rows is ever held in memory. Rows go to a temporary file next
+    to the output, which is renamed over the output in one step when the writer is
+    closed, so a run that stops part way never leaves a half-written output behind;
+    `discard` removes the temporary file instead.
 
     Args:
-        games (dict): A dictionary of game details, where each key is a game ID and each value is another
-                      dictionary containing game details such as title, year, ratings, etc.
-        player_count_data_dict (dict): A dictionary where each key is a game ID and each value is a
-                                        dictionary with player counts as keys and recommendation details as values.
-        json_filename (str): The name of the JSON file to write the data to.
+        csv_filename (str): The filename of the CSV file to write the data to.
     """
-    data_to_write = []  # Initialize the list to hold each game's data for JSON output.
-    
-    # Iterate through each game ID and its player count data in the player count dictionary.
-    for game_id, player_data in player_count_data_dict.items():
-        if game_id in games:
-            # Prepare the game's static details.
-            game_info = {
-                'Game Title': games[game_id]['Game Title'],
-                'Game ID': game_id,
-                'Year': games[game_id].get('Year', 'N/A'),
-                'BGG Rank': games[game_id].get('BGG Rank', 'N/A'),
-                'Average Rating': games[game_id]['Average Rating'],
-                'Number of Voters': games[game_id]['Number of Voters'],
-                'Weight': games[game_id].get('Weight', 'N/A'),
-                'Weight Votes': games[game_id].get('Weight Votes', 'N/A'),
-                'Owned': games[game_id]['Owned'],
-                'Type': games[game_id]['Type'],
-                'Player Counts': {}
-            }
-            # Add player count recommendations as a nested structure within each game entry.
-            for count, details in player_data.items():
-                # Convert count to an integer, if possible, for the 'Player Count' field
-                try:
-                    player_count_int = int(count)
-                except ValueError:
-                    player_count_int = count  # Keep as string if not convertible
-                
-                game_info['Player Counts'][count] = {
-                    'Player Count': player_count_int,  # Add the integer player count here
-                    'Best %': details['Best %'],
-                    'Best Votes': details['Best Votes'],
-                    'Recommended %': details['Recommended %'],
-                    'Recommended Votes': details['Recommended Votes'],
-                    'Not Recommended %': details['Not Recommended %'],
-                    'Not Recommended Votes': details['Not Recommended Votes'],
-                    'Vote Count': details['Vote Count']
-                }
-            data_to_write.append(game_info)  # Add the game's complete information to the list.
+
+    def __init__(self, csv_filename):
+        self.csv_filename = csv_filename
+        self.temp_filename = f"{csv_filename}.tmp"
+        self.csvfile = open(self.temp_filename, 'w', newline='', encoding='utf-8')
+        self.writer = None
+        self.lock = threading.Lock()
+
+    def write_games(self, games, player_count_data_dict):
+        """
+        Appends the rows for the games in a player count data dictionary.
+
+        Args:
+            games (dict): A dictionary containing game details.
+            player_count_data_dict (dict): Player count recommendation data for the games to write.
+        """
+        with self.lock:
+            for row in merged_csv_rows(games, player_count_data_dict):
+                # Write the header from the first row's field names.
+                if self.writer is None:
+                    self.writer = csv.DictWriter(self.csvfile, fieldnames=list(row.keys()))
+                    self.writer.writeheader()
+                self.writer.writerow(row)
+
+    def close(self):
+        """
+        Finishes the file and moves it into place.
+        """
+        self.csvfile.close()
+        os.replace(self.temp_filename, self.csv_filename)
+
+    def discard(self):
+        """
+        Closes and removes the temporary file, leaving any earlier output untouched.
+
+        Called when a run stops before the writer is closed; does nothing once it has been closed.
+        """
+        self.csvfile.close()
+        if os.path.exists(self.temp_filename):
+            os.remove(self.temp_filename)
+
+def write_merged_data_to_csv(games, player_count_data_dict, csv_filename):
+    """
+    Writes the merged game and player count data to a CSV file.
+
+    This function takes the merged data from the games dictionary and the player count data dictionary,
+    then writes it into a CSV file with detailed information for each game. This includes game title,
+    ID, year, average rating, number of voters, weight, weight votes, ownership status, type, player count,
+    and various voting percentages and counts related to player count recommendations.
+
+    Args:
+        games (dict): A dictionary containing game details.
+        player_count_data_dict (dict): A dictionary containing player count recommendation data for each game.
+        csv_filename (str): The filename of the CSV file to write the data to.
+    """
+    csv_writer = CSVStreamWriter(csv_filename)
+    try:
+        csv_writer.write_games(games, player_count_data_dict)
+        csv_writer.close()
+    finally:
+        csv_writer.discard()
+
+def json_game_entry(game_id, game, player_data):
+    """
+    Builds the JSON entry for one game, with its player count recommendations nested inside.
+
+    Args:
+        game_id (str): The game's ID.
+        game (dict): The game's details.
+        player_data (dict): The game's player count recommendation data, keyed by player count.
+
+    Returns:
+        dict: The game's details with a 'Player Counts' entry for each player count.
+    """
+    # Prepare the game's static details.
+    game_info = {
+        'Game Title': game['Game Title'],
+        'Game ID': game_id,
+        'Year': game.get('Year', 'N/A'),
+        'BGG Rank': game.get('BGG Rank', 'N/A'),
+        'Average Rating': game['Average Rating'],
+        'Number of Voters': game['Number of Voters'],
+        'Weight': game.get('Weight', 'N/A'),
+        'Weight Votes': game.get('Weight Votes', 'N/A'),
+        'Owned': game['Owned'],
+        'Type': game['Type'],
+        'Player Counts': {}
+    }
+    # Add player count recommendations as a nested structure within each game entry.
+    for count, details in player_data.items():
+        # Convert count to an integer, if possible, for the 'Player Count' field
+        try:
+            player_count_int = int(count)
+        except ValueError:
+            player_count_int = count  # Keep as string if not convertible
+
+        game_info['Player Counts'][count] = {
+            'Player Count': player_count_int,  # Add the integer player count here
+            'Best %': details['Best %'],
+            'Best Votes': details['Best Votes'],
+            'Recommended %': details['Recommended %'],
+            'Recommended Votes': details['Recommended Votes'],
+            'Not Recommended %': details['Not Recommended %'],
+            'Not Recommended Votes': details['Not Recommended Votes'],
+            'Vote Count': details['Vote Count']
+        }
+    return game_info
+
+def write_merged_data_to_json(games, player_count_data_dict, json_filename):
+    """
+    Writes game data and player count recommendations to a JSON file.
+
+    This function creates a JSON file where each game is represented once with its details,
+    and player count recommendations are nested within each game entry. This structure minimizes
+    duplication of game details across different player counts.
+
+    Args:
+        games (dict): A dictionary of game details, where each key is a game ID and each value is another
+                      dictionary containing game details such as title, year, ratings, etc.
+        player_count_data_dict (dict): A dictionary where each key is a game ID and each value is a
+                                        dictionary with player counts as keys and recommendation details as values.
+        json_filename (str): The name of the JSON file to write the data to.
+    """
+    # Build each game's entry, in the order of the player count dictionary.
+    data_to_write = [json_game_entry(game_id, games[game_id], player_data)
+                     for game_id, player_data in player_count_data_dict.items() if game_id in games]
 
     # Write the list of games with their nested player count data to a JSON file.
     with open(json_filename, 'w', encoding='utf-8') as file:
         json.dump(data_to_write, file, ensure_ascii=False, indent=4)
 
+def ndjson_line(game_info):
+    """
+    Serializes one game's JSON entry as a compact NDJSON line.
+
+    orjson is used when it is installed, and the standard json module otherwise. Unranked
+    games are written with a 'BGG Rank' of "inf", since infinity is not valid JSON.
+
+    Args:
+        game_info (dict): The game's entry, as built by `json_game_entry`.
+
+    Returns:
+        bytes: The UTF-8 encoded line, including the trailing newline.
+    """
+    if game_info['BGG Rank'] == float('inf'):
+        game_info = {**game_info, 'BGG Rank': 'inf'}
+    if orjson is not None:
+        return orjson.dumps(game_info, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(game_info, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+def npz_value(value, dtype):
+    """
+    Converts a CSV cell value to the type of its NPZ column.
+
+    Missing values ('N/A' or None) become 0 in integer columns and NaN in float columns.
+
+    Args:
+        value: The value written to the CSV file for the cell.
+        dtype (str): The NumPy type of the column.
+
+    Returns:
+        int or float: The converted value.
+    """
+    if dtype.startswith('int'):
+        return 0 if value in ('N/A', None) else int(value)
+    return float('nan') if value in ('N/A', None) else float(value)
+
+def write_merged_data_to_npz(games, player_count_data_dict, npz_filename):
+    """
+    Writes the merged game and player count data to a NumPy NPZ file of column arrays.
+
+    The file holds the same rows as the CSV output, stored column by column with the types in
+    `NPZ_COLUMN_TYPES`, so the viewer can load it without parsing any text. Each string column
+    is stored as an int32 array of codes together with a '<column> strings' array of its
+    distinct values, and the 'columns' array lists the column names in order.
+
+    Args:
+        games (dict): A dictionary containing game details.
+        player_count_data_dict (dict): A dictionary containing player count recommendation data for each game.
+        npz_filename (str): The filename of the NPZ file to write the data to.
+    """
+    if np is None:
+        raise ImportError("The npz output type requires numpy.")
+
+    # Collect the values of each column, row by row.
+    column_values = {column: [] for column in NPZ_COLUMN_TYPES}
+    for row in merged_csv_rows(games, player_count_data_dict):
+        for column, values in column_values.items():
+            values.append(row[column])
+
+    arrays = {'columns': np.array(list(NPZ_COLUMN_TYPES), dtype=str)}
+    for column, dtype in NPZ_COLUMN_TYPES.items():
+        if dtype == 'str':
+            # Give each distinct string a code in the order it first appears.
+            strings = {}
+            arrays[column] = np.array([strings.setdefault(value, len(strings)) for value in column_values[column]], dtype=np.int32)
+            arrays[f"{column} strings"] = np.array(list(strings), dtype=str)
+        else:
+            arrays[column] = np.array([npz_value(value, dtype) for value in column_values[column]], dtype=dtype)
+
+    # Write under a temporary name, then move the file into place.
+    temp_filename = f"{npz_filename}.tmp"
+    try:
+        with open(temp_filename, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(temp_filename, npz_filename)
+    finally:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+
+class NDJSONStreamWriter:
+    """
+    Writes game data to an NDJSON file, one compact JSON object per game, a batch at a time.
+
+    Like `CSVStreamWriter`, games are appended as each batch is enriched and the file is
+    written under a temporary name that is renamed over the output when the writer is
+    closed. Each line holds the same entry as the JSON output, so consumers can process
+    the games one line at a time.
+
+    Args:
+        ndjson_filename (str): The filename of the NDJSON file to write the data to.
+    """
+
+    def __init__(self, ndjson_filename):
+        self.ndjson_filename = ndjson_filename
+        self.temp_filename = f"{ndjson_filename}.tmp"
+        self.file = open(self.temp_filename, 'wb')
+        self.lock = threading.Lock()
+
+    def write_games(self, games, player_count_data_dict):
+        """
+        Appends a line for each game in a player count data dictionary.
+
+        Args:
+            games (dict): A dictionary containing game details.
+            player_count_data_dict (dict): Player count recommendation data for the games to write.
+        """
+        lines = [ndjson_line(json_game_entry(game_id, games[game_id], player_data))
+                 for game_id, player_data in player_count_data_dict.items() if game_id in games]
+        with self.lock:
+            self.file.writelines(lines)
+
+    def close(self):
+        """
+        Finishes the file and moves it into place.
+        """
+        self.file.close()
+        os.replace(self.temp_filename, self.ndjson_filename)
+
+    def discard(self):
+        """
+        Closes and removes the temporary file, leaving any earlier output untouched.
+
+        Called when a run stops before the writer is closed; does nothing once it has been closed.
+        """
+        self.file.close()
+        if os.path.exists(self.temp_filename):
+            os.remove(self.temp_filename)
+
 import requests
 from bs4 import BeautifulSoup
 import time
 
-def update_boardgame_data(games, batch_size=100, progress_bar=None):
+def fetch_thing_batch(session, batch_ids, max_retries=5):
+    """
+    Requests one batch of games from the BoardGameGeek XML API thing endpoint, retrying on failure.
+
+    Args:
+        session (BGGSession): The session object used for making HTTP requests.
+        batch_ids (list): The game IDs to include in the request.
+        max_retries (int): The maximum number of attempts.
+
+    Returns:
+        requests.Response: The last response received, or None if no response was received at all.
+
+    Raises:
+        CacheMissError: In offline mode, if the batch was never cached.
+    """
+    game_ids_param = ",".join(map(str, batch_ids))  # Convert batch IDs to a comma-separated string.
+    url = f"{session.base_url}/xmlapi2/thing?id={game_ids_param}&stats=1"  # Construct the API request URL.
+
+    print(f"Requesting URL: {url}")  # Print the URL to the console
+
+    return get_with_retries(session, url, max_retries)
+
+def summarize_player_count_votes(best_votes, recommended_votes, not_recommended_votes):
+    """
+    Builds the player count data for one player count from its poll votes.
+
+    Args:
+        best_votes (int): Number of "Best" votes.
+        recommended_votes (int): Number of "Recommended" votes.
+        not_recommended_votes (int): Number of "Not Recommended" votes.
+
+    Returns:
+        dict: The vote counts together with their percentages of the total.
+    """
+    vote_count = best_votes + recommended_votes + not_recommended_votes
+    best_percentage = round((best_votes / vote_count) * 100, 1) if vote_count else 0
+    recommended_percentage = round((recommended_votes / vote_count) * 100, 1) if vote_count else 0
+    not_recommended_percentage = round((not_recommended_votes / vote_count) * 100, 1) if vote_count else 0
+
+    return {
+        'Best %': best_percentage,
+        'Best Votes': best_votes,
+        'Recommended %': recommended_percentage,
+        'Recommended Votes': recommended_votes,
+        'Not Recommended %': not_recommended_percentage,
+        'Not Recommended Votes': not_recommended_votes,
+        'Vote Count': vote_count
+    }
+
+def parse_thing_response_bs4(content):
+    """
+    Parses an XML API thing response with BeautifulSoup.
+
+    This builds a full tree for the response and is kept as a fallback for `parse_thing_response_lxml`.
+
+    Args:
+        content (bytes): The body of the thing response.
+
+    Yields:
+        tuple: The game ID, a dictionary with the game's year, weight, weight votes and BGG Rank,
+               and the game's player count data.
+    """
+    soup = BeautifulSoup(content, "xml")  # Parse the XML response
+
+    for item in soup.find_all("item"):
+        game_id = item["id"]
+        year_pub = item.yearpublished["value"]
+
+        num_weights = int(item.statistics.ratings.numweights["value"])
+        average_weight = round(float(item.statistics.ratings.averageweight["value"]), 2)
+
+        # Extract the BGG Rank
+        rank_element = item.find("rank", {"name": "boardgame"})
+        if rank_element:
+            bgg_rank = rank_element["value"]
+        else:
+            bgg_rank = float('inf')  # Set to infinity if not ranked
+        
+        if bgg_rank == "Not Ranked":
+            bgg_rank = float('inf')  # Set to infinity if not ranked
+
+        # Extract and process player count recommendation data.
+        suggested_numplayers = item.find("poll", {"name": "suggested_numplayers"})
+        player_count_data = {}
+
+        if suggested_numplayers:
+            for result in suggested_numplayers.find_all("results"):
+                numplayers = result["numplayers"]
+                if "+" in numplayers:  # Skip ambiguous player counts like '10+'.
+                    continue
+
+                best_votes, recommended_votes, not_recommended_votes = 0, 0, 0
+                for vote in result.find_all("result"):
+                    if vote["value"] == "Best":
+                        best_votes = int(vote["numvotes"])
+                    elif vote["value"] == "Recommended":
+                        recommended_votes = int(vote["numvotes"])
+                    elif vote["value"] == "Not Recommended":
+                        not_recommended_votes = int(vote["numvotes"])
+
+                player_count_data[numplayers] = summarize_player_count_votes(best_votes, recommended_votes, not_recommended_votes)
+
+        game_details = {'Year': year_pub, 'Weight': average_weight, 'Weight Votes': num_weights, 'BGG Rank': bgg_rank}
+        yield game_id, game_details, player_count_data
+
+def parse_thing_response_lxml(content):
+    """
+    Parses an XML API thing response in a single streaming pass with lxml.
+
+    Each item is handled as soon as its closing tag is read, by walking its direct
+    children rather than searching the whole tree, and is cleared once it has been
+    handled so memory use stays flat however large the batch is. The results are the
+    same as `parse_thing_response_bs4`.
+
+    Args:
+        content (bytes): The body of the thing response.
+
+    Yields:
+        tuple: The game ID, a dictionary with the game's year, weight, weight votes and BGG Rank,
+               and the game's player count data.
+    """
+    vote_keys = {"Best": 0, "Recommended": 1, "Not Recommended": 2}
+
+    for _, item in etree.iterparse(io.BytesIO(content), events=("end",), tag="item", recover=True, huge_tree=True):
+        game_id = item.get("id")
+        year_pub = item.find("yearpublished").get("value")
+
+        ratings = item.find("statistics/ratings")
+        num_weights = int(ratings.find("numweights").get("value"))
+        average_weight = round(float(ratings.find("averageweight").get("value")), 2)
+
+        # Extract the BGG Rank; unranked games are set to infinity.
+        bgg_rank = float('inf')
+        for rank_element in ratings.iterfind("ranks/rank"):
+            if rank_element.get("name") == "boardgame":
+                bgg_rank = rank_element.get("value")
+                break
+        if bgg_rank == "Not Ranked":
+            bgg_rank = float('inf')
+
+        # Extract and process player count recommendation data.
+        player_count_data = {}
+        for poll in item.iterfind("poll"):
+            if poll.get("name") != "suggested_numplayers":
+                continue
+            for result in poll.iterfind("results"):
+                numplayers = result.get("numplayers")
+                if "+" in numplayers:  # Skip ambiguous player counts like '10+'.
+                    continue
+
+                votes = [0, 0, 0]
+                for vote in result.iterfind("result"):
+                    if vote.get("value") in vote_keys:
+                        votes[vote_keys[vote.get("value")]] = int(vote.get("numvotes"))
+
+                player_count_data[numplayers] = summarize_player_count_votes(*votes)
+            break
+
+        game_details = {'Year': year_pub, 'Weight': average_weight, 'Weight Votes': num_weights, 'BGG Rank': bgg_rank}
+        yield game_id, game_details, player_count_data
+
+        # Free the finished item and any earlier siblings still held by the root.
+        item.clear()
+        while item.getprevious() is not None:
+            del item.getparent()[0]
+
+def parse_thing_response(content, parser='lxml'):
+    """
+    Parses an XML API thing response with the chosen parser.
+
+    Args:
+        content (bytes): The body of the thing response.
+        parser (str): 'lxml' for the streaming parser, or 'bs4' for the BeautifulSoup fallback.
+
+    Returns:
+        iterator: The (game ID, game details, player count data) tuples for each item in the response.
+    """
+    if parser == 'bs4':
+        return parse_thing_response_bs4(content)
+    return parse_thing_response_lxml(content)
+
+def split_into_batches(game_ids, batch_size, controller=None):
+    """
+    Splits a list of game IDs into batches.
+
+    Batches are made one at a time as they are consumed, so when a controller is given
+    each batch takes the controller's batch size at that moment.
+
+    Args:
+        game_ids (list): The game IDs to split.
+        batch_size (int): The number of game IDs in each batch, when no controller is given.
+        controller (AdaptiveController, optional): The controller that decides the size of each batch.
+
+    Yields:
+        list: A batch of game IDs.
+    """
+    i = 0
+    while i < len(game_ids):
+        size = controller.next_batch_size() if controller else batch_size
+        yield game_ids[i:i + size]
+        i += size
+
+def batches_from_queue(game_queue, batch_size, controller=None):
+    """
+    Groups game IDs taken from a queue into batches, yielding each batch as soon as it is full.
+
+    A None in the queue marks the end of the IDs; any IDs left over at that point are
+    yielded as a final, partial batch.
+
+    Args:
+        game_queue (queue.Queue): The queue the game IDs are put on.
+        batch_size (int): The number of game IDs in each batch, when no controller is given.
+        controller (AdaptiveController, optional): The controller that decides the size of each batch.
+
+    Yields:
+        list: A batch of game IDs.
+    """
+    batch = []
+    while True:
+        game_id = game_queue.get()
+        if game_id is None:
+            break
+        batch.append(game_id)
+        if len(batch) >= (controller.next_batch_size() if controller else batch_size):
+            yield batch
+            batch = []
+
+    # Flush the last partial batch.
+    if batch:
+        yield batch
+
+def update_boardgame_data(games, batch_size=100, progress_bar=None, session=None, concurrency=1, batches=None, parser='lxml', on_batch=None):
     """
     Updates the games dictionary with additional board game data from the BoardGameGeek API.
 
@@ -370,124 +1832,684 @@ def update_boardgame_data(games, batch_size=100, progress_bar=None):
     weight votes, BGG Rank, and player count recommendations. It updates the games dictionary
     with this new information for each game. The function handles API requests in batches to
     manage request volume and incorporates a progress bar for visual progress tracking.
+    Up to `concurrency` batches can be requested at once; their results are always applied
+    in batch order, so the output does not depend on the concurrency level.
+
+    A batch that still fails after its retries is set aside and tried again once every other
+    batch is done. If it fails again, it is split in half, and each half is tried and split in
+    turn, so a bad ID or an oversized response only loses the games that cannot be fetched on
+    their own. Splitting stops when no half in a round succeeds, as the server is then failing
+    every request rather than a few bad IDs, or after `BISECT_MAX_DEPTH` splits. A batch missing
+    from the cache in offline mode is skipped rather than retried. The IDs of the games whose
+    details could not be fetched are printed at the end.
 
     Args:
         games (dict): The dictionary of games to be updated with additional data.
         batch_size (int): The number of game IDs to include in each batch API request.
         progress_bar (tqdm.tqdm, optional): Optional tqdm progress bar instance for visual progress tracking.
+        session (BGGSession, optional): The session used for the API requests, so that they share its
+                                        headers, rate limiter and controller. A new session is created if not provided.
+        concurrency (int): The maximum number of batches to request at once.
+        batches (iterable, optional): Batches of game IDs to request, in place of splitting every game in
+                                      `games` into batches of `batch_size`. Used by pipeline mode to
+                                      request batches while games are still being discovered.
+        parser (str): The parser for the XML responses: 'lxml' (streaming) or 'bs4' (BeautifulSoup).
+        on_batch (callable, optional): Called after each batch with two dictionaries keyed by game ID:
+                                       the batch's updated games and their player count data.
 
     Returns:
         tuple: A tuple containing the updated games dictionary and a new dictionary with player count data.
     """
-    game_ids = list(games.keys())  # Extract game IDs from the games dictionary.
+    # Fall back to a new session when none is given.
+    if session is None:
+        session = create_session(batch_size=batch_size)
+
+    # Split the game IDs into batches to manage API request volume.
+    # The session's controller may resize the batches as the run goes on.
+    if batches is None:
+        game_ids = list(games.keys())  # Extract game IDs from the games dictionary.
+        batches = split_into_batches(game_ids, batch_size, session.controller)
 
     # Initialize a dictionary to store player count data for all games.
     player_count_data_dict = {}
 
-    # Iterate over game IDs in batches to manage API request volume.
-    for i in range(0, len(game_ids), batch_size):
-        batch_ids = game_ids[i:i + batch_size]  # Create a batch of game IDs.
-        game_ids_param = ",".join(map(str, batch_ids))  # Convert batch IDs to a comma-separated string.
-        url = f"https://boardgamegeek.com/xmlapi2/thing?id={game_ids_param}&stats=1"  # Construct the API request URL.
-
-        print(f"Requesting URL: {url}")  # Print the URL to the console
+    # Every requested ID, to find the games that were lost, and the batches set aside to retry at the end.
+    requested_ids = []
+    deferred_batches = []
 
-        retries = 0  # Initialize a retry counter.
-        while retries < 5:  # Retry up to 5 times
-            try:
-                response = requests.get(url)
-                response.raise_for_status()  # Raise an exception for HTTP errors
-                break
-            except requests.exceptions.HTTPError as e:
-                if response.status_code == 429:  # Too many requests
-                    retries += 1
-                    wait_time = 10 * retries
-                    print(f"Rate limit hit. Retrying in {wait_time} seconds... ({retries})")
-                    time.sleep(wait_time)  # Exponential backoff
-                else:
-                    retries += 1
-                    print(f"Error {response.status_code}. Retrying... ({retries})")
-                    time.sleep(5)
-            except requests.exceptions.ChunkedEncodingError:
-                retries += 1
-                print(f"ChunkedEncodingError encountered. Retrying... ({retries})")
-                time.sleep(5)
-            except requests.exceptions.RequestException as e:
-                retries += 1
-                print(f"RequestException encountered: {e}. Retrying... ({retries})")
-                time.sleep(5)
-
-        if response.status_code != 200:
-            print(f"Failed to fetch game data for batch starting at index {i}. Skipping this batch.")
-            continue
+    def fetch_batch(batch_ids, max_retries=5):
+        try:
+            return batch_ids, fetch_thing_batch(session, batch_ids, max_retries), False
+        except CacheMissError as e:
+            # In offline mode, a batch that was never cached cannot be fetched by retrying or splitting it.
+            print(f"{e}. Skipping this batch.")
+            return batch_ids, None, True
 
-        soup = BeautifulSoup(response.content, "xml")  # Parse the XML response
+    def apply_response(response):
+        batch_games = {}
+        batch_player_counts = {}
+        parse_start = time.perf_counter()
 
         # Iterate over each game item in the XML to extract and update game details.
-        for item in soup.find_all("item"):
-            game_id = item["id"]
-            year_pub = item.yearpublished["value"]
-            games[game_id]['Year'] = year_pub  # Update the game's publication year.
-
-            num_weights = int(item.statistics.ratings.numweights["value"])
-            average_weight = round(float(item.statistics.ratings.averageweight["value"]), 2)
-            games[game_id]['Weight'] = average_weight  # Update the game's weight.
-            games[game_id]['Weight Votes'] = num_weights  # Update the number of weight votes.
-
-            # Extract the BGG Rank
-            rank_element = item.find("rank", {"name": "boardgame"})
-            if rank_element:
-                bgg_rank = rank_element["value"]
-            else:
-                bgg_rank = float('inf')  # Set to infinity if not ranked
-            
-            if bgg_rank == "Not Ranked":
-                bgg_rank = float('inf')  # Set to infinity if not ranked
-            
-            games[game_id]['BGG Rank'] = bgg_rank  # Update the game's BGG Rank.
-
-            # Extract and process player count recommendation data.
-            suggested_numplayers = item.find("poll", {"name": "suggested_numplayers"})
-            player_count_data = {}
-
-            if suggested_numplayers:
-                for result in suggested_numplayers.find_all("results"):
-                    numplayers = result["numplayers"]
-                    if "+" in numplayers:  # Skip ambiguous player counts like '10+'.
-                        continue
-
-                    best_votes, recommended_votes, not_recommended_votes = 0, 0, 0
-                    for vote in result.find_all("result"):
-                        if vote["value"] == "Best":
-                            best_votes = int(vote["numvotes"])
-                        elif vote["value"] == "Recommended":
-                            recommended_votes = int(vote["numvotes"])
-                        elif vote["value"] == "Not Recommended":
-                            not_recommended_votes = int(vote["numvotes"])
-
-                    vote_count = best_votes + recommended_votes + not_recommended_votes
-                    best_percentage = round((best_votes / vote_count) * 100, 1) if vote_count else 0
-                    recommended_percentage = round((recommended_votes / vote_count) * 100, 1) if vote_count else 0
-                    not_recommended_percentage = round((not_recommended_votes / vote_count) * 100, 1) if vote_count else 0
-
-                    player_count_data[numplayers] = {
-                        'Best %': best_percentage,
-                        'Best Votes': best_votes,
-                        'Recommended %': recommended_percentage,
-                        'Recommended Votes': recommended_votes,
-                        'Not Recommended %': not_recommended_percentage,
-                        'Not Recommended Votes': not_recommended_votes,
-                        'Vote Count': vote_count
-                    }
-
+        for game_id, game_details, player_count_data in parse_thing_response(response.content, parser):
+            games[game_id].update(game_details)  # Update the game's year, weight, weight votes and BGG Rank.
             player_count_data_dict[game_id] = player_count_data  # Add the player count data for the current game.
+            batch_games[game_id] = games[game_id]
+            batch_player_counts[game_id] = player_count_data
 
             if progress_bar:
                 progress_bar.update(1)  # Update the progress bar if provided.
 
+        session.metrics.record_parse('thing', time.perf_counter() - parse_start, len(batch_games))
+
+        if on_batch:
+            on_batch(batch_games, batch_player_counts)
+
+    # Process the batches in order as their responses arrive.
+    i = 0  # Index of the first game in the current batch.
+    for batch_ids, response, cache_miss in ordered_map(fetch_batch, batches, concurrency):
+        requested_ids.extend(batch_ids)
+        i += len(batch_ids)
+        if cache_miss:
+            continue
+        if response is None or response.status_code != 200:
+            print(f"Failed to fetch game data for batch starting at index {i - len(batch_ids)}. Retrying it at the end of the run.")
+            deferred_batches.append(batch_ids)
+            continue
+        apply_response(response)
+
+    # Try the failed batches again, splitting those that still fail until the bad IDs are isolated.
+    max_retries = 5
+    depth = 0
+    while deferred_batches:
+        print(f"Retrying {len(deferred_batches)} failed batches of game data.")
+        failed_batches = []
+        any_succeeded = False
+        for batch_ids, response, cache_miss in ordered_map(partial(fetch_batch, max_retries=max_retries), deferred_batches, concurrency):
+            if response is not None and response.status_code == 200:
+                apply_response(response)
+                any_succeeded = True
+            elif not cache_miss and len(batch_ids) > 1:
+                failed_batches.append(batch_ids)
+
+        if not failed_batches:
+            break
+        # The first retry is of whole batches, which fail again if they hold a bad ID, so only the halves must make progress.
+        if depth > 0 and not any_succeeded:
+            print("No part of the failed batches could be fetched; the server may be down or limiting requests.")
+            break
+        if depth == BISECT_MAX_DEPTH:
+            print(f"Stopped splitting the failed batches after {BISECT_MAX_DEPTH} splits.")
+            break
+        deferred_batches = [half for batch_ids in failed_batches for half in (batch_ids[:len(batch_ids) // 2], batch_ids[len(batch_ids) // 2:])]
+        max_retries = BISECT_MAX_RETRIES
+        depth += 1
+
+    # Report every game whose details could not be fetched, whether its request failed or the response left it out.
+    lost_ids = [game_id for game_id in requested_ids if game_id not in player_count_data_dict]
+    session.metrics.record_lost_games(lost_ids)
+    if lost_ids:
+        print(f"Could not fetch game data for {len(lost_ids)} games: {', '.join(map(str, lost_ids))}")
+
     return games, player_count_data_dict  # Return the updated games dictionary and the new player count data dictionary
 
-def main(username, games_to_fetch, output_filename, batch_size, output_type):
+def load_previous_output(filename):
+    """
+    Loads the games and player count data from a previous CSV, JSON, NDJSON or NPZ output file.
+
+    This reverses `write_merged_data_to_csv`, `write_merged_data_to_json`, `NDJSONStreamWriter`
+    and `write_merged_data_to_npz`, so the dictionaries have the same layout and value types as
+    those built during a run.
+
+    Args:
+        filename (str): The previous output file; its extension decides how it is read.
+
+    Returns:
+        tuple: The games dictionary and the player count data dictionary read from the file.
+    """
+    games = {}
+    player_count_data_dict = {}
+
+    def parse_rank(bgg_rank):
+        # Unranked games are written as infinity.
+        return float(bgg_rank) if bgg_rank in ('inf', float('inf')) else bgg_rank
+
+    if filename.endswith('.npz'):
+        if np is None:
+            raise ImportError("Reading an npz output requires numpy.")
+        with np.load(filename) as arrays:
+            columns = {column: arrays[column].tolist() for column in arrays['columns'].tolist()}
+            for column, dtype in NPZ_COLUMN_TYPES.items():
+                if dtype == 'str':
+                    strings = arrays[f"{column} strings"].tolist()
+                    columns[column] = [strings[code] for code in columns[column]]
+
+        for row in (dict(zip(columns, values)) for values in zip(*columns.values())):
+            game_id = str(row['Game ID'])
+            if game_id not in games:
+                games[game_id] = {
+                    'Game Title': row['Game Title'],
+                    'Type': row['Type'],
+                    'Game ID': game_id,
+                    'Average Rating': row['Average Rating'],
+                    'Number of Voters': row['Number of Voters'],
+                    'Weight': row['Weight'],
+                    'Weight Votes': row['Weight Votes'],
+                    'Owned': row['Owned'],
+                    'Year': str(row['Year']),
+                    # Ranks are whole numbers, except for unranked games which keep their infinite rank.
+                    'BGG Rank': row['BGG Rank'] if not math.isfinite(row['BGG Rank']) else str(int(row['BGG Rank'])),
+                }
+                player_count_data_dict[game_id] = {}
+
+            player_count_data_dict[game_id][str(row['Player Count'])] = {
+                key: row[key] for key in ('Best %', 'Best Votes', 'Recommended %', 'Recommended Votes',
+                                          'Not Recommended %', 'Not Recommended Votes', 'Vote Count')
+            }
+    elif filename.endswith(('.json', '.ndjson')):
+        with open(filename, encoding='utf-8') as file:
+            if filename.endswith('.ndjson'):
+                game_infos = (json.loads(line) for line in file if line.strip())
+            else:
+                game_infos = json.load(file)
+            for game_info in game_infos:
+                game_id = game_info['Game ID']
+                player_counts = game_info.pop('Player Counts')
+                game_info['BGG Rank'] = parse_rank(game_info['BGG Rank'])
+                games[game_id] = game_info
+                player_count_data_dict[game_id] = {
+                    count: {key: value for key, value in details.items() if key != 'Player Count'}
+                    for count, details in player_counts.items()
+                }
+    else:
+        with open(filename, newline='', encoding='utf-8') as csvfile:
+            for row in csv.DictReader(csvfile):
+                game_id = row['Game ID']
+                if game_id not in games:
+                    games[game_id] = {
+                        'Game Title': row['Game Title'],
+                        'Type': row['Type'],
+                        'Game ID': game_id,
+                        'Average Rating': float(row['Average Rating']),
+                        'Number of Voters': int(row['Number of Voters']),
+                        'Weight': float(row['Weight']),
+                        'Weight Votes': int(row['Weight Votes']),
+                        'Owned': row['Owned'],
+                        'Year': row['Year'],
+                        'BGG Rank': parse_rank(row['BGG Rank']),
+                    }
+                    player_count_data_dict[game_id] = {}
+
+                player_count_data_dict[game_id][row['Player Count']] = {
+                    'Best %': float(row['Best %']),
+                    'Best Votes': int(row['Best Votes']),
+                    'Recommended %': float(row['Recommended %']),
+                    'Recommended Votes': int(row['Recommended Votes']),
+                    'Not Recommended %': float(row['Not Recommended %']),
+                    'Not Recommended Votes': int(row['Not Recommended Votes']),
+                    'Vote Count': int(row['Vote Count'])
+                }
+
+    return games, player_count_data_dict
+
+def load_update_times(filename, game_ids):
+    """
+    Loads when each game in a previous output file last had its details fetched.
+
+    The times are kept in a companion file next to the output (see `update_times_filename`).
+    Games missing from it, or all games if it does not exist, are given the modification
+    time of the output file itself.
+
+    Args:
+        filename (str): The previous output file.
+        game_ids (iterable): The IDs of the games in the previous output.
+
+    Returns:
+        dict: Game IDs as keys and Unix timestamps as values.
+    """
+    update_times = {}
+    if os.path.exists(update_times_filename(filename)):
+        with open(update_times_filename(filename), encoding='utf-8') as file:
+            update_times = json.load(file)
+
+    file_time = os.path.getmtime(filename)
+    return {game_id: update_times.get(game_id, file_time) for game_id in game_ids}
+
+def update_times_filename(filename):
+    """
+    Returns the name of the file that records when each game in an output file was last updated.
+    """
+    return f"{filename}.updated.json"
+
+def game_needs_update(game, previous_games, previous_player_counts, update_times, max_age_days):
+    """
+    Decides whether a game's details need to be fetched again in incremental mode.
+
+    A game is fetched if it is not in the previous output, if its number of voters has
+    changed since then, or if its details were last fetched more than `max_age_days` ago.
+
+    Args:
+        game (dict): The game's details from the current search or collection.
+        previous_games (dict): The games dictionary from the previous output.
+        previous_player_counts (dict): The player count data dictionary from the previous output.
+        update_times (dict): When each previous game's details were last fetched, as Unix timestamps.
+        max_age_days (float): The age, in days, after which a game's details are fetched again.
+
+    Returns:
+        bool: True if the game's details should be fetched.
+    """
+    game_id = game['Game ID']
+    if game_id not in previous_player_counts:
+        return True
+    if game['Number of Voters'] != previous_games[game_id]['Number of Voters']:
+        return True
+    return time.time() - update_times[game_id] > max_age_days * 86400
+
+def merge_previous_data(games, player_count_data_dict, previous_games, previous_player_counts):
+    """
+    Fills in the details of games that were not fetched again from a previous output.
+
+    Games whose details were fetched in this run keep them. Every other game takes its
+    year, weight, weight votes, BGG Rank and player count data from the previous output,
+    which also covers games whose batch failed in this run. The returned player count
+    data is in the order of the games dictionary, as in a full run.
+
+    Args:
+        games (dict): The games dictionary for this run.
+        player_count_data_dict (dict): The player count data fetched in this run.
+        previous_games (dict): The games dictionary from the previous output.
+        previous_player_counts (dict): The player count data dictionary from the previous output.
+
+    Returns:
+        dict: The merged player count data dictionary.
+    """
+    merged_player_counts = {}
+    for game_id, game in games.items():
+        if game_id in player_count_data_dict:
+            merged_player_counts[game_id] = player_count_data_dict[game_id]
+        elif game_id in previous_player_counts:
+            for key in ENRICHED_FIELDS:
+                game[key] = previous_games[game_id][key]
+            merged_player_counts[game_id] = previous_player_counts[game_id]
+
+    return merged_player_counts
+
+class RunJournal:
+    """
+    An append-only journal of the work completed during a run, so an interrupted run can be resumed.
+
+    Each completed search page, the owned collection and each enriched thing batch is
+    written as one JSON line as soon as it finishes. The parsed results are recorded
+    rather than the raw responses, so a resumed run reuses them without parsing anything
+    again. A line cut short by an interruption is ignored when the journal is loaded.
+
+    Args:
+        filename (str): The journal file.
+        username (str): The BoardGameGeek username of the run; a journal from another user is not resumed.
+        resume (bool): Whether to load the existing journal and carry on appending to it,
+                       rather than starting a new one. A journal from another user is replaced.
+    """
+
+    def __init__(self, filename, username, resume=False):
+        self.filename = filename
+        self.pages = {}
+        self.owned_games = None
+        self.game_details = {}
+        self.player_counts = {}
+        self.lock = threading.Lock()
+
+        if resume and os.path.exists(filename) and self.load(username):
+            self.file = open(filename, 'a', encoding='utf-8')
+        else:
+            # A file only ever holds one run, so a journal that cannot be resumed is replaced.
+            self.file = open(filename, 'w', encoding='utf-8')
+            self.write({'type': 'run', 'username': username})
+
+    def load(self, username):
+        """
+        Loads the work recorded in the journal.
+
+        Args:
+            username (str): The username of the run being resumed.
+
+        Returns:
+            bool: Whether the journal belongs to a run for the same user. If not, nothing is loaded.
+        """
+        run_found = False
+        with open(self.filename, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Skip a line cut short by the interruption.
+
+                if record['type'] == 'run':
+                    if record['username'] != username:
+                        print(f"Journal {self.filename} belongs to user {record['username']}; starting from scratch.")
+                        self.pages, self.owned_games, self.game_details, self.player_counts = {}, None, {}, {}
+                        return False
+                    run_found = True
+                elif record['type'] == 'page':
+                    self.pages[record['page']] = record['games']
+                elif record['type'] == 'collection':
+                    self.owned_games = record['games']
+                elif record['type'] == 'batch':
+                    self.game_details.update(record['games'])
+                    self.player_counts.update(record['player_counts'])
+
+        if not run_found:
+            # The run record was cut short, so the journal cannot be tied to a user.
+            print(f"Journal {self.filename} has no run record; starting from scratch.")
+            self.pages, self.owned_games, self.game_details, self.player_counts = {}, None, {}, {}
+            return False
+
+        print(f"Resuming from {self.filename}: {len(self.pages)} search pages and {len(self.player_counts)} games already done.")
+        return True
+
+    def write(self, record):
+        with self.lock:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.file.flush()
+
+    def record_page(self, page_number, page_games):
+        self.write({'type': 'page', 'page': page_number, 'games': page_games})
+
+    def record_collection(self, games_owned):
+        self.write({'type': 'collection', 'games': games_owned})
+
+    def record_batch(self, batch_games, batch_player_counts):
+        # Only the details filled in by the thing API are needed to restore the games.
+        batch_details = {game_id: {key: game[key] for key in ENRICHED_FIELDS} for game_id, game in batch_games.items()}
+        self.write({'type': 'batch', 'games': batch_details, 'player_counts': batch_player_counts})
+
+    def restore(self, games, player_count_data_dict):
+        """
+        Adds the details of games enriched before the interruption.
+
+        Args:
+            games (dict): The games dictionary to update.
+            player_count_data_dict (dict): The player count data fetched in this run.
+
+        Returns:
+            dict: The player count data for both runs, in the order of the games dictionary.
+        """
+        if not self.player_counts:
+            return player_count_data_dict
+
+        for game_id, game_details in self.game_details.items():
+            if game_id in games and game_id not in player_count_data_dict:
+                games[game_id].update(game_details)
+                player_count_data_dict[game_id] = self.player_counts[game_id]
+
+        return {game_id: player_count_data_dict[game_id] for game_id in games if game_id in player_count_data_dict}
+
+    def close(self, remove=False):
+        """
+        Closes the journal, removing it if the run finished.
+        """
+        self.file.close()
+        if remove:
+            os.remove(self.filename)
+
+def fetch_games_owned_journaled(session, username, journal=None, parser='lxml', queue_timeout=DEFAULT_COLLECTION_QUEUE_TIMEOUT):
+    """
+    Fetches the user's owned games through `fetch_games_owned_api`, or takes them from the journal.
+
+    Args:
+        session (requests.Session): The session object used for making HTTP requests.
+        username (str): The BoardGameGeek username whose owned games are to be fetched.
+        journal (RunJournal, optional): The run's journal.
+        parser (str): The parser for the XML responses: 'lxml' or 'bs4'.
+        queue_timeout (float): The longest time, in seconds, to wait for each collection while BoardGameGeek prepares it.
+
+    Returns:
+        dict: A dictionary with game IDs as keys and dictionaries containing game details as values.
+    """
+    if journal and journal.owned_games is not None:
+        return journal.owned_games
+
+    with session.metrics.stage('collection'):
+        games_owned = fetch_games_owned_api(session, username, parser=parser, queue_timeout=queue_timeout)
+    if journal:
+        journal.record_collection(games_owned)
+    return games_owned
+
+def collect_games_pipelined(session, username, games_to_fetch, batch_size=100, concurrency=1, needs_update=None, parser='lxml', journal=None,
+                            on_batch=None, queue_timeout=DEFAULT_COLLECTION_QUEUE_TIMEOUT):
+    """
+    Discovers games and fetches their details at the same time.
+
+    The user's owned collection is fetched first, so every game's ownership is known by the
+    time its details arrive. Game IDs found on each search page, and then the owned games
+    the search did not find, are put on a queue as they are found. A consumer thread takes
+    them off the queue and requests them from the thing API in batches of `batch_size` as
+    soon as each batch is full, so enrichment overlaps with discovery instead of waiting for
+    it to finish. IDs are queued in the same order the serial path would batch them, so the
+    results are the same.
+
+    Args:
+        session (requests.Session): The session object used for making HTTP requests.
+        username (str): The BoardGameGeek username whose owned games are included.
+        games_to_fetch (int): The number of games to collect from the search pages.
+        batch_size (int): The number of game IDs to include in each batch API request.
+        concurrency (int): The maximum number of requests of each kind to run at once.
+        needs_update (callable, optional): Called with each game's details; only games it returns True
+                                           for are queued. Every game is queued if not provided.
+        parser (str): The parser for the XML responses: 'lxml' or 'bs4'.
+        journal (RunJournal, optional): The run's journal, which completed pages and the collection
+                                        are recorded in and taken from.
+        on_batch (callable, optional): Passed on to `update_boardgame_data`, called after each enriched batch.
+        queue_timeout (float): The longest time, in seconds, to wait for each collection while BoardGameGeek prepares it.
+
+    Returns:
+        tuple: The games dictionary, the owned games dictionary and the player count data dictionary.
+    """
+    games = {}
+    game_queue = queue.Queue()
+
+    # Fetch games owned by the user before any details are requested.
+    games_owned = fetch_games_owned_journaled(session, username, journal, parser=parser, queue_timeout=queue_timeout)
+
+    with tqdm(total=0, smoothing=0, desc="Updating game data", position=1) as update_bar:
+        def enqueue(game):
+            # Record the game and hand its ID to the consumer.
+            if game["Game ID"] in games_owned:
+                game['Owned'] = 'Owned'
+            games[game["Game ID"]] = game
+            if needs_update and not needs_update(game):
+                return
+            update_bar.total += 1
+            update_bar.refresh()
+            game_queue.put(game["Game ID"])
+
+        with ThreadPoolExecutor(max_workers=1) as consumer:
+            enrichment = consumer.submit(update_boardgame_data, games, batch_size=batch_size, progress_bar=update_bar, session=session,
+                                         concurrency=concurrency, batches=batches_from_queue(game_queue, batch_size, session.controller), parser=parser,
+                                         on_batch=on_batch)
+            try:
+                with tqdm(total=games_to_fetch, desc="Fetching games", position=0) as fetch_bar:
+                    fetch_search_pages(session, username, games_to_fetch, concurrency=concurrency, progress_bar=fetch_bar, on_new_game=enqueue,
+                                       parser=parser, journal=journal)
+
+                # Queue the owned games not found by the search.
+                for game_id, game_owned in games_owned.items():
+                    if game_id not in games:
+                        enqueue(game_owned)
+            finally:
+                # Tell the consumer there are no more IDs so it flushes the last batch.
+                game_queue.put(None)
+
+            games, player_count_data_dict = enrichment.result()
+
+    return games, games_owned, player_count_data_dict
+
+def collect_games_for_users(session, usernames, games_to_fetch, batch_size=100, concurrency=1, parser='lxml',
+                            queue_timeout=DEFAULT_COLLECTION_QUEUE_TIMEOUT):
+    """
+    Collects the games for several users with a single crawl of the search pages.
+
+    The search pages list the same games for every user, so they are fetched once. The users'
+    collections are fetched at the same time as each other, and the details of every game that
+    is on the search pages or owned by any of the users are requested once, however many users
+    own it.
+
+    Args:
+        session (BGGSession): The session object used for making HTTP requests.
+        usernames (list): The BoardGameGeek usernames whose owned games are included.
+        games_to_fetch (int): The number of games to collect from the search pages.
+        batch_size (int): The number of game IDs to include in each batch API request.
+        concurrency (int): The maximum number of search pages or batches to request at once.
+        parser (str): The parser for the search pages and XML responses: 'lxml' or 'bs4'.
+        queue_timeout (float): The longest time, in seconds, to wait for each collection while BoardGameGeek prepares it.
+
+    Returns:
+        tuple: The games dictionary, the IDs of the games found on the search pages, a dictionary of
+               each user's owned games keyed by username, and the player count data dictionary.
+    """
+    with tqdm(total=games_to_fetch, desc="Fetching games") as progress_bar, session.metrics.stage('discovery'):
+        games = fetch_search_pages(session, usernames[0], games_to_fetch, concurrency=concurrency, progress_bar=progress_bar, parser=parser)
+    search_game_ids = list(games)
+
+    print("\n")
+
+    # Fetch every user's collection at once.
+    with session.metrics.stage('collection'):
+        users_games_owned = dict(zip(usernames, ordered_map(partial(fetch_games_owned_api, session, parser=parser, queue_timeout=queue_timeout),
+                                                                 usernames, len(usernames))))
+
+    for username, games_owned in users_games_owned.items():
+        print(f"Owned games fetched for {username}: {len(games_owned)}")
+
+    # Add the owned games the search did not find, in the order a single user's run would add them.
+    for games_owned in users_games_owned.values():
+        for game_id, game_owned in games_owned.items():
+            games.setdefault(game_id, game_owned)
+
+    print(f"Total games after merge: {len(games)}")
+
+    print("\n")
+
+    game_ids = list(games)
+    with tqdm(total=len(game_ids), smoothing=0, desc="Updating game data") as progress_bar, session.metrics.stage('enrichment'):
+        games, player_count_data_dict = update_boardgame_data(games, batch_size=batch_size, progress_bar=progress_bar, session=session,
+                                                              concurrency=concurrency, batches=split_into_batches(game_ids, batch_size, session.controller),
+                                                              parser=parser)
+
+    return games, search_game_ids, users_games_owned, player_count_data_dict
+
+def games_for_user(games, search_game_ids, games_owned, player_count_data_dict):
+    """
+    Picks out one user's games from those collected for several users, with the user's ownership.
+
+    Args:
+        games (dict): The games collected for every user.
+        search_game_ids (list): The IDs of the games found on the search pages.
+        games_owned (dict): The user's owned games.
+        player_count_data_dict (dict): The player count data of every game.
+
+    Returns:
+        tuple: The user's games dictionary and player count data dictionary, in the same order as a run for the user alone.
+    """
+    user_games = {}
+    for game_id in search_game_ids:
+        user_games[game_id] = {**games[game_id], 'Owned': 'Owned' if game_id in games_owned else 'Not Owned'}
+    for game_id in games_owned:
+        if game_id not in user_games:
+            user_games[game_id] = {**games[game_id], 'Owned': 'Owned'}
+
+    user_player_counts = {game_id: player_count_data_dict[game_id] for game_id in user_games if game_id in player_count_data_dict}
+    return user_games, user_player_counts
+
+def write_output(games, player_count_data_dict, output_type, output_filename):
+    """
+    Writes the games and their player count data to a file of the given output type in one go.
+
+    Args:
+        games (dict): A dictionary containing game details.
+        player_count_data_dict (dict): A dictionary containing player count recommendation data for each game.
+        output_type (str): 'csv', 'json', 'ndjson' or 'npz'.
+        output_filename (str): The file to write.
+    """
+    if output_type == 'csv':
+        write_merged_data_to_csv(games, player_count_data_dict, output_filename)
+    elif output_type == 'json':
+        write_merged_data_to_json(games, player_count_data_dict, output_filename)
+    elif output_type == 'ndjson':
+        writer = NDJSONStreamWriter(output_filename)
+        try:
+            writer.write_games(games, player_count_data_dict)
+            writer.close()
+        finally:
+            writer.discard()
+    elif output_type == 'npz':
+        write_merged_data_to_npz(games, player_count_data_dict, output_filename)
+
+def finish_run(session, cache, metrics_out, options, player_count_data_dict):
+    """
+    Reports the response cache's hits and misses, and writes the run report if one was asked for.
+
+    Args:
+        session (BGGSession): The run's session, whose metrics the report is built from.
+        cache (ResponseCache, optional): The run's response cache, which is closed.
+        metrics_out (str, optional): The file to write the run report to.
+        options (dict): The run's options, included in the report.
+        player_count_data_dict (dict): The player count data collected in the run.
+    """
+    if cache is not None:
+        print(f"Response cache: {cache.hits} hits, {cache.misses} misses.")
+        cache.close()
+
+    if metrics_out:
+        report = session.metrics.report(
+            options=options,
+            games=len(player_count_data_dict),
+            rows=sum(map(len, player_count_data_dict.values())),
+        )
+        report['games_per_second'] = report['games'] / report['wall_time']
+        with open(metrics_out, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+        print(f"Run report written to {metrics_out}.")
+
+def read_usernames(usernames=None, usernames_file=None):
+    """
+    Gathers the usernames given with --username and in a --usernames_file.
+
+    Args:
+        usernames (list, optional): The usernames given on the command line.
+        usernames_file (str, optional): A file with one username per line; blank lines are skipped.
+
+    Returns:
+        list: The usernames without duplicates, in the order given, or the default user if none were given.
+    """
+    usernames = list(usernames or [])
+    if usernames_file:
+        with open(usernames_file, encoding='utf-8') as file:
+            usernames.extend(line.strip() for line in file if line.strip())
+    return list(dict.fromkeys(usernames)) or ["Percy0715"]
+
+def parse_cache_ttls(cache_ttl_args):
+    """
+    Parses --cache_ttl arguments of the form ENDPOINT=HOURS into a dictionary.
+
+    Args:
+        cache_ttl_args (list): The ENDPOINT=HOURS strings given on the command line.
+
+    Returns:
+        dict: The time-to-live in hours for each endpoint given.
+    """
+    cache_ttls = {}
+    for cache_ttl in cache_ttl_args:
+        endpoint, _, hours = cache_ttl.partition("=")
+        if endpoint not in DEFAULT_CACHE_TTLS or not hours:
+            raise argparse.ArgumentTypeError(f"Invalid --cache_ttl '{cache_ttl}'; expected one of {', '.join(DEFAULT_CACHE_TTLS)} followed by =HOURS")
+        cache_ttls[endpoint] = float(hours)
+    return cache_ttls
+
+def main(username, games_to_fetch, output_filename, batch_size, output_type, concurrency=1, rate_limit=1.0, pipeline=False,
+         cache_file=None, cache_ttls=None, cache_size=500, offline=False, incremental=None, max_age=30,
+         parser='lxml', min_batch_size=None, max_batch_size=None, controller_log=None, resume=False, base_url=DEFAULT_BASE_URL,
+         metrics_out=None, pool_size=None, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+         collection_timeout=DEFAULT_COLLECTION_QUEUE_TIMEOUT):
     """
     The main function of the script, responsible for orchestrating the entire data collection,
     processing, and CSV writing process.
@@ -497,70 +2519,194 @@ def main(username, games_to_fetch, output_filename, batch_size, output_type):
     
     print("\n**********************")
 
-    # Initialize a session with a random user agent for web requests.
-    session = create_session()
+    # Several usernames may be given; they share one crawl of the search pages.
+    usernames = [username] if isinstance(username, str) else list(username)
+    if len(usernames) > 1 and (pipeline or incremental or resume):
+        raise ValueError("Pipeline, incremental and resume modes take a single username.")
+    username = usernames[0]
 
-    # Initialize variables for loop control and data storage.
-    fetched_games = 0
-    current_page = 1
-    games = {}
+    run_options = {'usernames': usernames, 'fetch': games_to_fetch, 'batch_size': batch_size, 'output_type': output_type,
+                   'concurrency': concurrency, 'rate_limit': rate_limit, 'pipeline': pipeline, 'incremental': bool(incremental),
+                   'parser': parser}
+
+    # Open the response cache; offline mode always needs one.
+    if offline and not cache_file:
+        cache_file = DEFAULT_CACHE_FILE
+    cache = ResponseCache(cache_file, ttls=cache_ttls, max_size=cache_size, offline=offline) if cache_file else None
+
+    # Log the adaptive controller's decisions if asked to.
+    if controller_log:
+        log_handler = logging.FileHandler(controller_log, encoding='utf-8')
+        log_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(log_handler)
+        logger.setLevel(logging.INFO)
+
+    # Initialize a session with a random user agent for web requests.
+    # All requests share the session's rate limiter and adaptive controller, however many run at once.
+    # Its connection pool holds a keep-alive connection for each request that can run at once: in pipeline mode,
+    # search pages and thing batches are requested side by side, and every user's two collections are requested together.
+    if pool_size is None:
+        pool_size = max(2 * concurrency if pipeline else concurrency, 2 * len(usernames), DEFAULT_POOL_SIZE)
+    session = create_session(rate_limit=rate_limit, cache=cache, batch_size=batch_size, min_batch_size=min_batch_size, max_batch_size=max_batch_size,
+                             base_url=base_url, pool_size=pool_size,
+                             connect_timeout=connect_timeout, read_timeout=read_timeout)
 
     # Debug mode to fetch a smaller set of games for testing.
     debug = False
     if debug:
         games_to_fetch = 10
 
-    # Progress bar to visually track the game fetching progress.
-    with tqdm(total=games_to_fetch, desc="Fetching games") as progress_bar:
-        while fetched_games < games_to_fetch:
-            # Fetch games from the current page.
-            page_games = fetch_games(session, username, current_page)
-            for game in page_games.values():
-                if fetched_games >= games_to_fetch:
-                    break
-                fetched_games += 1
-                games[game["Game ID"]] = game
-                progress_bar.update(1)
-            current_page += 1
+    # Append the proper file extension based on the output type
+    if not output_filename.endswith(f'.{output_type}'):
+        output_filename_with_extension = f"{output_filename}.{output_type}"
+    else:
+        output_filename_with_extension = output_filename
 
-    print("\n")
+    # Check for numpy before any games are fetched, rather than when the output is written.
+    if output_type == 'npz' and np is None:
+        raise ImportError("The npz output type requires numpy.")
+
+    if len(usernames) > 1:
+        # Fetch the search pages and game details once, then write one output per user, named after them.
+        games, search_game_ids, users_games_owned, player_count_data_dict = collect_games_for_users(session, usernames, games_to_fetch, batch_size=batch_size,
+                                                                                                   concurrency=concurrency, parser=parser,
+                                                                                                   queue_timeout=collection_timeout)
+        print("\n")
+
+        output_basename = output_filename_with_extension[:-len(f".{output_type}")]
+        with session.metrics.stage('writing'):
+            for user, games_owned in users_games_owned.items():
+                user_filename = f"{output_basename}_{user}.{output_type}"
+                user_games, user_player_counts = games_for_user(games, search_game_ids, games_owned, player_count_data_dict)
+                write_output(user_games, user_player_counts, output_type, user_filename)
+                print(f"Success! Data for {user} written in {output_type.upper()} format to {user_filename}.")
+
+        finish_run(session, cache, metrics_out, run_options, player_count_data_dict)
+        return
+
+    # Record completed work as it finishes, so an interrupted run can be resumed.
+    journal = RunJournal(f"{output_filename_with_extension}.journal", username, resume=resume)
+
+    # CSV rows and NDJSON lines are written as each batch is enriched rather than all at the end.
+    # When games from the journal or a previous output have to be merged in, every game is written
+    # at the end instead so the games stay in order.
+    stream_writers = {'csv': CSVStreamWriter, 'ndjson': NDJSONStreamWriter}
+    stream_writer = stream_writers[output_type](output_filename_with_extension) if output_type in stream_writers else None
+    stream_output = stream_writer is not None and not incremental and not journal.player_counts
+
+    try:
+        def on_batch(batch_games, batch_player_counts):
+            journal.record_batch(batch_games, batch_player_counts)
+            if stream_output:
+                with session.metrics.stage('writing'):
+                    stream_writer.write_games(batch_games, batch_player_counts)
+
+        # In incremental mode, load the previous output so only new, changed or stale games are fetched.
+        if incremental:
+            previous_games, previous_player_counts = load_previous_output(incremental)
+            update_times = load_update_times(incremental, previous_player_counts)
+            print(f"Loaded {len(previous_player_counts)} games from {incremental}.")
+
+        def needs_update(game):
+            # Games enriched before an interruption are taken from the journal instead.
+            if game['Game ID'] in journal.player_counts:
+                return False
+            if incremental:
+                return game_needs_update(game, previous_games, previous_player_counts, update_times, max_age)
+            return True
+
+        if pipeline:
+            # Discover games and fetch their details at the same time. The collection is fetched first, and timed on its own.
+            with session.metrics.stage('discovery and enrichment'):
+                games, games_owned, player_count_data_dict = collect_games_pipelined(session, username, games_to_fetch, batch_size=batch_size,
+                                                                                     concurrency=concurrency, needs_update=needs_update, parser=parser,
+                                                                                     journal=journal, on_batch=on_batch, queue_timeout=collection_timeout)
+
+            print("\n")
+            print(f"Total owned games fetched: {len(games_owned)}")
+            print(f"Total games after merge: {len(games)}")
+        else:
+            # Progress bar to visually track the game fetching progress.
+            with tqdm(total=games_to_fetch, desc="Fetching games") as progress_bar, session.metrics.stage('discovery'):
+                games = fetch_search_pages(session, username, games_to_fetch, concurrency=concurrency, progress_bar=progress_bar, parser=parser,
+                                           journal=journal)
 
-    # Fetch games owned by the user.
-    games_owned = fetch_games_owned_api(session, username)
+            print("\n")
 
-    print(f"Total owned games fetched: {len(games_owned)}")
+            # Fetch games owned by the user.
+            games_owned = fetch_games_owned_journaled(session, username, journal, parser=parser, queue_timeout=collection_timeout)
 
-    # Merge fetched games with owned games data.
-    games = merge_games_and_update_owned(games, games_owned)
+            print(f"Total owned games fetched: {len(games_owned)}")
 
-    print(f"Total games after merge: {len(games)}")
+            # Merge fetched games with owned games data.
+            games = merge_games_and_update_owned(games, games_owned)
 
-    print("\n")
+            print(f"Total games after merge: {len(games)}")
 
-    # Update game data with additional information and player count data.
-    with tqdm(total=len(games), smoothing=0, desc="Updating game data") as progress_bar:
-        games, player_count_data_dict = update_boardgame_data(games, batch_size=batch_size, progress_bar=progress_bar)
+            print("\n")
 
-    print("\n")
+            # Pick the games whose details need to be fetched.
+            game_ids = [game_id for game_id, game in games.items() if needs_update(game)]
+            if incremental:
+                print(f"Incremental refresh: fetching details for {len(game_ids)} of {len(games)} games.")
+            batches = split_into_batches(game_ids, batch_size, session.controller)
 
-    print(f"Total games in gamesid {len(games)}")
-    print(f"Total line in playercount: {len(player_count_data_dict)}")
+            # Update game data with additional information and player count data.
+            with tqdm(total=len(game_ids), smoothing=0, desc="Updating game data") as progress_bar, session.metrics.stage('enrichment'):
+                games, player_count_data_dict = update_boardgame_data(games, batch_size=batch_size, progress_bar=progress_bar, session=session,
+                                                                      concurrency=concurrency, batches=batches, parser=parser,
+                                                                      on_batch=on_batch)
 
-    # Append the proper file extension based on the output type
-    if not output_filename.endswith(f'.{output_type}'):
-        output_filename_with_extension = f"{output_filename}.{output_type}"
-    else:
-        output_filename_with_extension = output_filename
+        # The games enriched in this run may already have been streamed to the output file.
+        streamed_game_ids = set(player_count_data_dict) if stream_output else set()
 
-    if output_type == 'csv':
-        write_merged_data_to_csv(games, player_count_data_dict, output_filename_with_extension)
-    elif output_type == 'json':
-        write_merged_data_to_json(games, player_count_data_dict, output_filename_with_extension)
+        # Add back the games enriched before an interruption.
+        player_count_data_dict = journal.restore(games, player_count_data_dict)
+
+        if incremental:
+            # Record when each game was last updated, then fill in the games that were not fetched again.
+            update_times.update(dict.fromkeys(player_count_data_dict, time.time()))
+            player_count_data_dict = merge_previous_data(games, player_count_data_dict, previous_games, previous_player_counts)
+
+        print("\n")
+
+        print(f"Total games in gamesid {len(games)}")
+        print(f"Total line in playercount: {len(player_count_data_dict)}")
+
+        with session.metrics.stage('writing'):
+            if stream_writer is not None:
+                # Write the games that were not streamed, then move the file into place.
+                stream_writer.write_games(games, {game_id: player_count_data for game_id, player_count_data in player_count_data_dict.items()
+                                                  if game_id not in streamed_game_ids})
+                stream_writer.close()
+            elif output_type == 'json':
+                write_merged_data_to_json(games, player_count_data_dict, output_filename_with_extension)
+            elif output_type == 'npz':
+                write_merged_data_to_npz(games, player_count_data_dict, output_filename_with_extension)
+    finally:
+        # If the run stops part way, remove the partly written file; once moved into place, there is nothing to remove.
+        if stream_writer is not None:
+            stream_writer.discard()
 
     print(f"Success! Data written in {output_type.upper()} format to {output_filename_with_extension}.")
 
+    # The run is complete, so the journal is no longer needed.
+    journal.close(remove=True)
+
+    if incremental:
+        with open(update_times_filename(output_filename_with_extension), 'w', encoding='utf-8') as file:
+            json.dump({game_id: update_times[game_id] for game_id in player_count_data_dict}, file)
+
+    finish_run(session, cache, metrics_out, run_options, player_count_data_dict)
+
 if __name__ == "__main__":
     args = get_args()  #Parse command-line arguments.
     
     # Pass the parsed arguments to your main function.
-    main(args.username, args.fetch, args.output, args.batch_size, args.output_type)
\ No newline at end of file
+    main(read_usernames(args.username, args.usernames_file), args.fetch, args.output, args.batch_size, args.output_type, concurrency=args.concurrency, rate_limit=args.rate_limit, pipeline=args.pipeline,
+         cache_file=args.cache, cache_ttls=parse_cache_ttls(args.cache_ttl), cache_size=args.cache_size, offline=args.offline,
+         incremental=args.incremental, max_age=args.max_age, parser=args.parser,
+         min_batch_size=args.min_batch_size, max_batch_size=args.max_batch_size, controller_log=args.controller_log,
+         resume=args.resume, base_url=args.base_url, metrics_out=args.metrics_out,
+         pool_size=args.pool_size, connect_timeout=args.connect_timeout, read_timeout=args.read_timeout,
+         collection_timeout=args.collection_timeout)
\ No newline at end of file
@@ -0,0 +1,394 @@
+import argparse
+import contextlib
+import gzip
+import os
+import random
+import re
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import BGG_PlayerCountData as bgg
+from BGG_Benchmark import collection_xml, generate_catalog, search_page_html, thing_xml
+
+# Below are the imports required for the stand-in server and the harness:
+# - `http.server`: the standard library HTTP server the stand-in is built on.
+# - `BGG_PlayerCountData`: the collection script whose `main()` the harness runs against the stand-in.
+# - `BGG_Benchmark`: generates the synthetic catalog and renders its pages and API responses.
+
+# Body of the 202 response the collection endpoint gives while a collection is being prepared.
+QUEUED_MESSAGE = ("<message>Your request for this collection has been accepted and will be processed.  "
+                  "Please try again later for access.</message>")
+
+def owned_game_ids(catalog, username):
+    """
+    Returns the IDs of the games a user owns in the stand-in's catalog.
+
+    Each username owns about one game in fifty, picked at random but the same for the same username,
+    so several users can be served with overlapping but different collections.
+
+    Args:
+        catalog (list): The catalog entries.
+        username (str): The username.
+
+    Returns:
+        set: The IDs of the user's owned games.
+    """
+    rng = random.Random(username)
+    return {game['id'] for game in catalog if rng.random() < 0.02}
+
+class FaultInjector:
+    """
+    Decides which requests to the stand-in server get a delayed or faulty response.
+
+    Faults are drawn from a seeded random generator, so a configuration gives the same mix of
+    faults each run, although which request gets which fault depends on the order they arrive in.
+
+    Args:
+        latency (float): Seconds to wait before answering each request.
+        latency_jitter (float): Up to this many seconds are added to the latency at random.
+        rate_429 (float): Fraction of requests answered with 429 Too Many Requests.
+        retry_after (float, optional): Value of the Retry-After header sent with each 429, in seconds.
+        collection_queued (int): Number of 202 responses each collection request gets before the collection is served.
+        chunked_failure_rate (float): Fraction of successful responses whose body is cut off partway through.
+        burst_every (int): Every this many requests, a burst of server errors starts. 0 disables bursts.
+        burst_length (int): Number of requests answered with a server error in each burst.
+        burst_status (int): Status code of the server errors in a burst.
+        bad_ids (iterable): Game IDs that make every thing request including them fail with a 500.
+        seed (int): Seed for the random faults.
+    """
+
+    def __init__(self, latency=0.0, latency_jitter=0.0, rate_429=0.0, retry_after=None, collection_queued=0,
+                 chunked_failure_rate=0.0, burst_every=0, burst_length=0, burst_status=503, bad_ids=(), seed=0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.collection_queued = collection_queued
+        self.chunked_failure_rate = chunked_failure_rate
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.burst_status = burst_status
+        self.bad_ids = set(bad_ids)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.collection_requests = Counter()
+
+    def next_fault(self, endpoint, path):
+        """
+        Picks the fault for the next request.
+
+        Args:
+            endpoint (str): The endpoint requested: 'search', 'collection', 'thing' or 'other'.
+            path (str): The requested path and query, which identifies a collection.
+
+        Returns:
+            tuple: The delay in seconds and the fault: None, 'burst', '429', 'queued', 'bad id' or 'chunked'.
+        """
+        with self.lock:
+            self.request_count += 1
+            delay = self.latency + self.random.uniform(0, self.latency_jitter)
+
+            # One draw decides between the random faults, so their rates add up.
+            roll = self.random.random()
+
+            if self.burst_every and (self.request_count - 1) % self.burst_every < self.burst_length:
+                return delay, 'burst'
+            if roll < self.rate_429:
+                return delay, '429'
+            if endpoint == 'collection':
+                self.collection_requests[path] += 1
+                if self.collection_requests[path] <= self.collection_queued:
+                    return delay, 'queued'
+            if endpoint == 'thing' and self.bad_ids:
+                query = parse_qs(urlparse(path).query)
+                if self.bad_ids.intersection(query.get('id', [""])[0].split(",")):
+                    return delay, 'bad id'
+            if roll < self.rate_429 + self.chunked_failure_rate:
+                return delay, 'chunked'
+            return delay, None
+
+class StubBGGServer(ThreadingHTTPServer):
+    """
+    A local stand-in for BoardGameGeek that serves a synthetic catalog.
+
+    It answers the search result pages, `xmlapi2/collection` and `xmlapi2/thing` endpoints with the
+    same layout as BoardGameGeek, delaying or breaking responses as its fault injector decides, and
+    counts every request and fault so a run can be summarized.
+
+    Args:
+        catalog (list): The catalog entries from `generate_catalog`, in search result order.
+        faults (FaultInjector, optional): Decides the delay and fault of each request. No faults without it.
+        address (tuple): The host and port to listen on; port 0 picks a free port.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, catalog, faults=None, address=("127.0.0.1", 0)):
+        super().__init__(address, StubBGGRequestHandler)
+        self.catalog = catalog
+        self.catalog_by_id = {game['id']: game for game in catalog}
+        self.faults = faults or FaultInjector()
+        self.stats_lock = threading.Lock()
+        self.requests_by_endpoint = Counter()
+        self.faults_injected = Counter()
+        self.urls_requested = Counter()
+        self.connections = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record_connection(self):
+        with self.stats_lock:
+            self.connections += 1
+
+    def record(self, endpoint, path, fault):
+        with self.stats_lock:
+            self.requests_by_endpoint[endpoint] += 1
+            self.urls_requested[path] += 1
+            if fault:
+                self.faults_injected[fault] += 1
+
+    def stats(self):
+        """
+        Returns the request counts so far.
+
+        Returns:
+            dict: The number of connections opened, the number of requests in total and by endpoint, the number
+                  of retries, the number of collection polls after a 202, and the number of each fault injected.
+        """
+        with self.stats_lock:
+            requests_issued = sum(self.requests_by_endpoint.values())
+            return {
+                'connections': self.connections,
+                'requests': requests_issued,
+                'requests_by_endpoint': dict(self.requests_by_endpoint),
+                # A 202 is followed by a poll for the same collection; the other repeated requests are retries.
+                'retries': requests_issued - len(self.urls_requested) - self.faults_injected['queued'],
+                'collection_polls': self.faults_injected['queued'],
+                'faults': dict(self.faults_injected),
+            }
+
+class StubBGGRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.record_connection()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        endpoint = bgg.endpoint_name(url.path)
+        delay, fault = self.server.faults.next_fault(endpoint, self.path)
+        self.server.record(endpoint, self.path, fault)
+        time.sleep(delay)
+
+        if fault == 'burst':
+            return self.send_body(self.server.faults.burst_status, b"Service Unavailable", "text/plain")
+        if fault == 'bad id':
+            return self.send_body(500, b"Internal Server Error", "text/plain")
+        if fault == '429':
+            headers = {} if self.server.faults.retry_after is None else {'Retry-After': f"{self.server.faults.retry_after:g}"}
+            return self.send_body(429, b"Rate limit exceeded", "text/plain", headers)
+        if fault == 'queued':
+            return self.send_body(202, QUEUED_MESSAGE.encode('utf-8'), "text/xml; charset=utf-8")
+
+        query = parse_qs(url.query)
+        search_page = re.fullmatch(r"/search/boardgame/page/(\d+)", url.path)
+        if search_page:
+            page_number = int(search_page.group(1))
+            page_games = self.server.catalog[(page_number - 1) * bgg.SEARCH_PAGE_SIZE:page_number * bgg.SEARCH_PAGE_SIZE]
+            body, content_type = search_page_html(page_games).encode('utf-8'), "text/html; charset=utf-8"
+        elif url.path == "/xmlapi2/thing" and 'id' in query:
+            batch_games = [self.server.catalog_by_id[game_id] for game_id in query['id'][0].split(",") if game_id in self.server.catalog_by_id]
+            body, content_type = thing_xml(batch_games), "text/xml; charset=utf-8"
+        elif url.path == "/xmlapi2/collection" and 'subtype' in query:
+            owned_ids = owned_game_ids(self.server.catalog, query.get('username', [""])[0])
+            body, content_type = collection_xml(self.server.catalog, query['subtype'][0], owned_ids), "text/xml; charset=utf-8"
+        else:
+            return self.send_body(404, b"Not Found", "text/plain")
+
+        # Compress the pages and responses when the client accepts it, as BoardGameGeek does.
+        headers = {}
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = "gzip"
+
+        if fault == 'chunked':
+            return self.send_cut_off_body(body, content_type, headers)
+        self.send_body(200, body, content_type, headers)
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_cut_off_body(self, body, content_type, headers):
+        # Send the first half of the body as one chunk, then drop the connection without the final chunk.
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        half = body[:len(body) // 2]
+        self.wfile.write(f"{len(body):x}\r\n".encode('ascii') + half)
+        self.wfile.flush()
+        self.close_connection = True
+        with contextlib.suppress(OSError):
+            self.connection.shutdown(socket.SHUT_RDWR)
+
+    def log_message(self, format, *args):
+        # Requests are counted rather than logged.
+        pass
+
+def start_stub_server(catalog, faults=None, host="127.0.0.1", port=0):
+    """
+    Starts a stand-in server on a background thread.
+
+    Args:
+        catalog (list): The catalog entries to serve.
+        faults (FaultInjector, optional): The faults to inject.
+        host (str): The host to listen on.
+        port (int): The port to listen on; 0 picks a free port.
+
+    Returns:
+        StubBGGServer: The running server; call its `shutdown` method to stop it.
+    """
+    server = StubBGGServer(catalog, faults, (host, port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_harness(games_to_fetch=1000, owned_extra=50, faults=None, quiet=False, seed=0, usernames=("stub",), **main_options):
+    """
+    Runs the collection script's `main()` against a stand-in server and measures the run.
+
+    The catalog holds `owned_extra` more games than are fetched from the search pages, so that
+    some owned games are only found through the collection, as for a real user.
+
+    Args:
+        games_to_fetch (int): The number of games to fetch from the search pages.
+        owned_extra (int): The number of games in the catalog beyond those fetched.
+        faults (FaultInjector, optional): The faults to inject.
+        quiet (bool): Hide the script's printed output.
+        seed (int): The seed for the synthetic catalog.
+        usernames (iterable): The users to collect the games of; several users share one crawl.
+        **main_options: Options passed on to `main()`, such as concurrency, rate_limit, pipeline and batch_size.
+
+    Returns:
+        dict: The wall time, the server's request counts, the number of distinct games written, the number
+              of games missing from the users' outputs and the games per second.
+    """
+    usernames = list(usernames)
+    catalog = generate_catalog(games_to_fetch + owned_extra, seed)
+    server = start_stub_server(catalog, faults)
+    main_options = {'batch_size': 100, 'output_type': 'csv', 'rate_limit': 0, **main_options}
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            output_filename = os.path.join(directory, "PlayerCountDataList")
+            start_time = time.monotonic()
+            with contextlib.ExitStack() as stack:
+                if quiet:
+                    stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+                bgg.main(usernames, games_to_fetch, output_filename, main_options.pop('batch_size'), main_options.pop('output_type'),
+                         base_url=server.base_url, **main_options)
+            wall_time = time.monotonic() - start_time
+
+            # A single user's output is named as given, and each of several users' outputs after the user.
+            games_written = set()
+            games_missing = 0
+            for username in usernames:
+                suffix = "" if len(usernames) == 1 else f"_{username}"
+                output_files = [name for name in os.listdir(directory)
+                                if name.startswith(f"PlayerCountDataList{suffix}.") and not name.endswith((".tmp", ".journal", ".updated.json"))]
+                _, player_count_data_dict = bgg.load_previous_output(os.path.join(directory, output_files[0]))
+                owned_ids = owned_game_ids(catalog, username)
+                expected_games = games_to_fetch + sum(game['id'] in owned_ids for game in catalog[games_to_fetch:])
+                games_missing += expected_games - len(player_count_data_dict)
+                games_written.update(player_count_data_dict)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        'wall_time': wall_time,
+        **server.stats(),
+        'games': len(games_written),
+        'games_missing': games_missing,
+        'games_per_second': len(games_written) / wall_time,
+    }
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for BoardGameGeek with injected faults, and measure the collection script against it.")
+
+    parser.add_argument("-u", "--username", nargs='+', default=["stub"], help="Users to collect the games of in the measured run; each owns different games (default: stub)")
+    parser.add_argument("--serve", action="store_true", help="Only run the stand-in server until interrupted, for pointing the script at with --base_url")
+    parser.add_argument("--port", type=int, default=0, help="Port for --serve to listen on (default: a free port)")
+    parser.add_argument("-f", "--fetch", type=int, default=1000, help="Number of games to fetch from the search pages (default: 1000)")
+    parser.add_argument("--owned_extra", type=int, default=50, help="Number of games in the catalog beyond those fetched, some of them owned (default: 50)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic catalog and the faults (default: 0)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the server waits before answering each request (default: 0)")
+    parser.add_argument("--latency_jitter", type=float, default=0.0, help="Up to this many random seconds are added to the latency (default: 0)")
+    parser.add_argument("--rate_429", type=float, default=0.0, help="Fraction of requests answered with 429 Too Many Requests (default: 0)")
+    parser.add_argument("--retry_after", type=float, help="Retry-After seconds sent with each 429 (default: none)")
+    parser.add_argument("--collection_queued", type=int, default=0, help="Number of 202 responses each collection request gets before it is served (default: 0)")
+    parser.add_argument("--chunked_failure_rate", type=float, default=0.0, help="Fraction of responses whose body is cut off partway through (default: 0)")
+    parser.add_argument("--burst_every", type=int, default=0, help="Start a burst of server errors every this many requests; 0 disables bursts (default: 0)")
+    parser.add_argument("--burst_length", type=int, default=5, help="Number of server errors in each burst (default: 5)")
+    parser.add_argument("--burst_status", type=int, default=503, help="Status code of the server errors in a burst (default: 503)")
+    parser.add_argument("--bad_ids", type=int, default=0, help="Number of fetched games whose ID makes any thing request including it fail with a 500 (default: 0)")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="Concurrency of the measured run (default: 1)")
+    parser.add_argument("-r", "--rate_limit", type=float, default=0, help="Rate limit of the measured run in requests per second; 0 for none (default: 0)")
+    parser.add_argument("-b", "--batch_size", type=int, default=100, help="Batch size of the measured run (default: 100)")
+    parser.add_argument("-p", "--pipeline", action="store_true", help="Use pipeline mode in the measured run")
+    parser.add_argument("-t", "--output_type", choices=['csv', 'json', 'ndjson', 'npz'], default='csv', help="Output type of the measured run (default: csv)")
+    parser.add_argument("--quiet", action="store_true", help="Hide the collection script's printed output")
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = get_args()
+
+    # The bad IDs are picked from the games that will be fetched.
+    catalog = generate_catalog(args.fetch + args.owned_extra, args.seed)
+    bad_ids = random.Random(args.seed).sample([game['id'] for game in catalog[:args.fetch]], args.bad_ids)
+
+    faults = FaultInjector(latency=args.latency, latency_jitter=args.latency_jitter, rate_429=args.rate_429, retry_after=args.retry_after,
+                           collection_queued=args.collection_queued, chunked_failure_rate=args.chunked_failure_rate,
+                           burst_every=args.burst_every, burst_length=args.burst_length, burst_status=args.burst_status,
+                           bad_ids=bad_ids, seed=args.seed)
+
+    if args.serve:
+        server = StubBGGServer(catalog, faults, ("127.0.0.1", args.port))
+        print(f"Serving {args.fetch + args.owned_extra} games at {server.base_url}. Press Ctrl+C to stop.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
+        stats = server.stats()
+        print(f"{stats['requests']} requests, {stats['retries']} retries, {stats['collection_polls']} collection polls, faults: {stats['faults']}")
+    else:
+        results = run_harness(args.fetch, args.owned_extra, faults, quiet=args.quiet, seed=args.seed, usernames=args.username, batch_size=args.batch_size,
+                              output_type=args.output_type, concurrency=args.concurrency, rate_limit=args.rate_limit, pipeline=args.pipeline)
+        print("\nHarness results:")
+        print(f"Wall time: {results['wall_time']:.2f} seconds")
+        print(f"Connections opened: {results['connections']}")
+        print(f"Requests issued: {results['requests']} ({', '.join(f'{endpoint}: {count}' for endpoint, count in sorted(results['requests_by_endpoint'].items()))})")
+        print(f"Retries: {results['retries']}")
+        print(f"Collection polls: {results['collection_polls']}")
+        print(f"Faults injected: {results['faults'] or 'none'}")
+        print(f"Games written: {results['games']} ({results['games_missing']} missing)")
+        print(f"Games per second: {results['games_per_second']:.1f}")
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+import BGG_PlayerCountData as bgg
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as file:
+        return file.read()
+
+def search_game(game_id, title, game_type, average_rating, num_voters):
+    return {
+        'Game Title': title,
+        'Type': game_type,
+        'Game ID': game_id,
+        'Average Rating': average_rating,
+        'Number of Voters': num_voters,
+        'Weight': None,
+        'Weight Votes': None,
+        'Owned': 'Not Owned'
+    }
+
+EXPECTED_GAMES = [
+    search_game('292375', "The Castles of Burgundy: Special Edition – The New Tiles", 'Expansion', 9.42105, 57),
+    search_game('342942', "Ark Nova", 'Base Game', 8.53681, 53420),
+    search_game('175914', "Dungeons & Dragons: Café “Magnate”", 'Base Game', 8.04313, 12034),
+    search_game('363788', "Pokémon <Expansion> & More", 'Expansion', 7.9, 50),
+    search_game('13', "CATAN", 'Base Game', 7.09839, 122683),
+]
+
+def test_parsers_agree_on_saved_page():
+    html = read_fixture("search_page.html")
+    assert bgg.parse_search_page(html, 'lxml') == bgg.parse_search_page(html, 'bs4')
+
+@pytest.mark.parametrize("parser", ['lxml', 'bs4'])
+def test_saved_page_rows(parser):
+    games = bgg.parse_search_page(read_fixture("search_page.html"), parser)
+
+    # The rows keep the page's order, which is the order the games are collected in.
+    assert list(games) == [game['Game ID'] for game in EXPECTED_GAMES]
+    assert list(games.values()) == EXPECTED_GAMES
+
+@pytest.mark.parametrize("parser", ['lxml', 'bs4'])
+def test_page_without_collection_table(parser):
+    html = "<html><body><div id='maincontent'><p>No results found.</p></div></body></html>"
+    assert bgg.parse_search_page(html, parser) is None